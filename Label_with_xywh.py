@@ -4,15 +4,25 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 import cv2
+from preset_stats import load_preset_config
+from label_io import read_labels
+from image_size import read_reduced
+from class_registry import load_class_registry
 
 # === CONFIG ===
-classes = ["Canister", "Foam", "Ring", "Tyvek", "Wafer"]
+# class names and file name patterns shared with the YOLO labeler, classes.json replaces the defaults
+class_registry = load_class_registry()
 
 bbox_presets = {
     "6 inch": (0.49954802858976477, 0.5574033282796372, 0.43050458369337075, 0.6787368486225077),
     "8 inch": (0.4936826531694092, 0.5458452479416916, 0.5703962017917926, 0.8867322545523849)
 }
 
+# presets estimated from a label corpus with preset_stats.py are offered next to the built-in ones
+preset_config = load_preset_config()
+if preset_config:
+    bbox_presets.update({name: tuple(box) for name, box in preset_config["presets"].items()})
+
 class AutoLabelingApp:
     def __init__(self, root):
         self.root = root
@@ -23,6 +33,8 @@ class AutoLabelingApp:
         self.image_folder = ""
         self.output_folder = ""
         self.bbox_size = tk.StringVar(value="6 inch")
+        # off : write the label files only, no image is decoded
+        self.draw_boxes = tk.BooleanVar(value=True)
 
         self.setup_ui()
 
@@ -43,8 +55,8 @@ class AutoLabelingApp:
 
         # Size selection
         tk.Label(self.root, text="Size:", font=font_label, bg="white").place(x=30, y=150)
-        tk.Radiobutton(self.root, text="6 inch", font=font_btn, variable=self.bbox_size, value="6 inch", bg="white").place(x=100, y=150)
-        tk.Radiobutton(self.root, text="8 inch", font=font_btn, variable=self.bbox_size, value="8 inch", bg="white").place(x=180, y=150)
+        tk.OptionMenu(self.root, self.bbox_size, *bbox_presets).place(x=100, y=145)
+        tk.Checkbutton(self.root, text="Draw boxes", font=font_btn, variable=self.draw_boxes, bg="white").place(x=300, y=150)
 
         # Preview area
         tk.Label(self.root, text="Preview", font=font_label, bg="white").place(x=30, y=200)
@@ -78,44 +90,46 @@ class AutoLabelingApp:
 
         for filename in os.listdir(self.image_folder):
             if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')):
-                class_index = None
-                for idx, cname in enumerate(classes):
-                    if cname.lower() in filename.lower():
-                        class_index = idx
-                        break
+                class_index = class_registry.match(filename)
                 if class_index is not None:
                     line = f"{class_index} {x} {y} {w} {h}\n"
                     txt_path = os.path.join(label_folder, os.path.splitext(filename)[0] + ".txt")
                     with open(txt_path, "w") as f:
                         f.write(line)
 
+        if not self.draw_boxes.get():
+            messagebox.showinfo("Success", "Auto labeling completed successfully!")
+            return
+
         # === วาดกรอบและเซฟทุกภาพ ===
         file_label_folder = os.path.join(self.output_folder, "image_label")
         os.makedirs(file_label_folder, exist_ok=True)
         image_files = [f for f in os.listdir(self.image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))]
+        # every label file of the folder in one bulk read
+        labels = read_labels(label_folder, cache=False)
 
         for filename in image_files:
             img_path = os.path.join(self.image_folder, filename)
-            label_path = os.path.join(label_folder, os.path.splitext(filename)[0] + ".txt")
+            label_name = os.path.splitext(filename)[0] + ".txt"
+            # images without a label are never decoded
+            if label_name not in labels.index:
+                continue
             img = cv2.imread(img_path)
-            if img is None or not os.path.exists(label_path):
+            if img is None:
                 continue
+            boxes = labels.boxes_of(label_name)
 
             h_img, w_img = img.shape[:2]
-            with open(label_path, "r") as f:
-                lines = f.readlines()
-
-            for line in lines:
-                parts = line.strip().split()
-                if len(parts) == 5:
-                    _, x_center, y_center, width, height = map(float, parts)
-                    x_c = x_center * w_img
-                    y_c = y_center * h_img
-                    w_box = width * w_img
-                    h_box = height * h_img
-                    x1, y1 = int(x_c - w_box / 2), int(y_c - h_box / 2)
-                    x2, y2 = int(x_c + w_box / 2), int(y_c + h_box / 2)
-                    cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+            for x_center, y_center, width, height in zip(boxes["x"].tolist(), boxes["y"].tolist(),
+                                                         boxes["w"].tolist(), boxes["h"].tolist()):
+                x_c = x_center * w_img
+                y_c = y_center * h_img
+                w_box = width * w_img
+                h_box = height * h_img
+                x1, y1 = int(x_c - w_box / 2), int(y_c - h_box / 2)
+                x2, y2 = int(x_c + w_box / 2), int(y_c + h_box / 2)
+                cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
 
             cv2.imwrite(os.path.join(file_label_folder, filename), img)
 
@@ -132,7 +146,8 @@ class AutoLabelingApp:
 
         selected = random.choice(files)
         img_path = os.path.join(self.image_folder, selected)
-        img = cv2.imread(img_path)
+        # only a 400x250 thumbnail is shown, a JPEG is decoded at 1/2, 1/4 or 1/8 when that still covers it
+        img = read_reduced(img_path, (400, 250))
 
         if img is None:
             return
@@ -0,0 +1,102 @@
+import argparse
+import sys
+
+from auto_label_ver_4byfrank import program
+from transfer import TRANSFER_MODES
+from backends import BACKENDS
+from stage_timer import PROFILERS
+from encoding import ENCODE_FORMATS, OVERLAY_MODES
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Headless YOLO auto labeling, same settings as the Auto labeling window")
+    parser.add_argument("--model", required=True, help="YOLO weight file")
+    parser.add_argument("--input", required=True, help="folder of input images")
+    parser.add_argument("--output", required=True, help="folder that receives output/ and report/")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto",
+                        help="auto runs .onnx files on onnxruntime and other weights on PyTorch")
+    parser.add_argument("--conf", type=float, default=0.5, help="confidence threshold")
+    parser.add_argument("--no-detection-report", action=argparse.BooleanOptionalAction, default=True,
+                        help="write report/no_detection.txt")
+    parser.add_argument("--more-than-two-report", action=argparse.BooleanOptionalAction, default=True,
+                        help="write report/more_than_two_detection.txt")
+    parser.add_argument("--structured-report", choices=["jsonl", "csv"],
+                        help="also write one record per image to report/report.<fmt>")
+    parser.add_argument("--transfer", choices=TRANSFER_MODES, default="copy",
+                        help="how input images are put into output/images and output/no detections, none leaves them out")
+    parser.add_argument("--overlay", choices=OVERLAY_MODES, default="all",
+                        help="which labeled images get a drawn copy in output/detections, off writes only label files")
+    parser.add_argument("--overlay-every", type=int, default=10, help="N of --overlay every")
+    parser.add_argument("--encode-format", choices=ENCODE_FORMATS, default="jpg", help="format of the overlay images")
+    parser.add_argument("--quality", type=int, help="jpg / webp quality 1-100, default is the OpenCV default")
+    parser.add_argument("--png-compression", type=int, choices=range(10), metavar="0-9", help="png compression level")
+    parser.add_argument("--encode-workers", type=int, default=2, help="overlay encoder threads")
+    parser.add_argument("--presets", help="config from preset_stats.py with the w/h acceptance ranges, "
+                                          "default is presets.json next to the scripts when it exists")
+    parser.add_argument("--classes", help="class config with names, colors and file name patterns, "
+                                          "default is classes.json next to the scripts when it exists")
+    parser.add_argument("--decode-scale", type=int, choices=[1, 2, 4, 8], default=1,
+                        help="decode images at 1/N size, labels stay normalized to the full frame")
+    parser.add_argument("--imgsz", type=int, help="model input size, default is the size the model was trained at")
+    parser.add_argument("--warmup-imgsz", type=int,
+                        help="size of the dummy warm-up image, default is --imgsz (640 without one)")
+    parser.add_argument("--warmup-runs", type=int, default=1, help="dummy inferences after loading the model")
+    parser.add_argument("--batch-size", type=int, default=1, help="images per model call")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, each with its own model")
+    parser.add_argument("--decode-workers", type=int, default=2, help="image decode threads")
+    parser.add_argument("--write-workers", type=int, default=2, help="output writer threads")
+    parser.add_argument("--queue-depth", type=int, default=16, help="decoded images held ahead of the model")
+    parser.add_argument("--recursive", action="store_true",
+                        help="also label images in subfolders of the input, the folders are kept in the output")
+    parser.add_argument("--dedup", action="store_true",
+                        help="run the model once per group of byte-identical images and give the copies its labels, "
+                             "groups in report/duplicate_groups.json")
+    parser.add_argument("--perceptual-dedup", action="store_true",
+                        help="also group re-encoded or resized copies by a perceptual hash, implies --dedup")
+    parser.add_argument("--timing", action="store_true",
+                        help="time every pipeline stage, summary in report/timing.txt and timing.json")
+    parser.add_argument("--profile", choices=PROFILERS, help="also profile the run into the report folder")
+    parser.add_argument("--manifest", action=argparse.BooleanOptionalAction, default=True,
+                        help="skip images already done in a previous run")
+    parser.add_argument("--manifest-hash", action="store_true",
+                        help="also compare file content hashes when size/mtime changed")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    auto_label = program()
+    auto_label.set_warmup(args.warmup_imgsz, args.warmup_runs)
+    auto_label.set_backend(args.backend)
+    # the model is warmed up at the inference size, so that is set before it loads
+    auto_label.set_resolution(args.decode_scale, args.imgsz)
+    auto_label.set_model(args.model)
+    auto_label.set_class()
+    auto_label.set_input_path(args.input)
+    auto_label.set_output_path(args.output)
+    auto_label.set_conf(args.conf)
+    if args.presets:
+        auto_label.load_ranges(args.presets)
+    if args.classes:
+        auto_label.load_classes(args.classes)
+    auto_label.set_structured_report(args.structured_report)
+    auto_label.set_transfer_mode(args.transfer)
+    auto_label.set_batch_size(args.batch_size)
+    auto_label.set_workers(args.workers)
+    auto_label.set_pipeline(args.decode_workers, args.write_workers, args.queue_depth)
+    auto_label.set_manifest(args.manifest, args.manifest_hash)
+    auto_label.set_timing(args.timing, args.profile)
+    auto_label.set_recursive(args.recursive)
+    auto_label.set_dedup(args.dedup, args.perceptual_dedup)
+    auto_label.set_overlay(args.overlay, args.overlay_every)
+    auto_label.set_encoding(args.encode_format, args.quality, args.png_compression, args.encode_workers)
+    auto_label.create_output_folder(args.output)
+    auto_label.create_report_folder(args.output, args.no_detection_report, args.more_than_two_report)
+    auto_label.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
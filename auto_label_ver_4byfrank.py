@@ -1,42 +1,142 @@
 import cv2
-from ultralytics import YOLO
-from tkinter import messagebox
-from tkinter import ttk
-import tkinter as tk
-from tkinter.colorchooser import *
-import tkinter.filedialog
-import customtkinter as ctk
+import numpy as np
 import os
 import shutil
 from tqdm import tqdm
 import random
+import threading
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import time
+import multiprocessing
+from concurrent.futures import wait
+import glob
+import json
+from manifest import Manifest
+from report_writer import ReportWriter, structured_report_file, write_records
+from transfer import TRANSFER_MODES, transfer_file, transfer_to_all
+from model_manager import ModelManager
+from backends import BACKENDS, load_model, to_numpy
+from preset_stats import PRESET_CONFIG, load_preset_config
+from class_registry import load_class_registry
+from stage_timer import PROFILERS, Profiler, StageTimer
+from dedup import HashCache, fast_hash, group_duplicates, hash_files, perceptual_hash
+from encoding import ENCODE_FORMATS, OVERLAY_MODES, ImageEncoder, wants_overlay
+from scanner import scan_chunks, scan_files
+
+# loaded models stay cached for the whole session, switching weight files is instant
+model_manager = ModelManager(load_model)
+
+# how often the window reads the progress of a running job
+PROGRESS_INTERVAL_MS = 250
+
+# reduced size decode, the overlay in output/detections is drawn on the reduced frame as well
+DECODE_FLAGS = {
+    1 : cv2.IMREAD_COLOR,
+    2 : cv2.IMREAD_REDUCED_COLOR_2,
+    4 : cv2.IMREAD_REDUCED_COLOR_4,
+    8 : cv2.IMREAD_REDUCED_COLOR_8,
+}
 
 class program :
     def save_random_preview(self, img_detection, filename, output_path, sample_rate=0.2):
         if random.random() < sample_rate:  # 20% sampling
-            preview_path = os.path.join(output_path, "preview")
-            os.makedirs(preview_path, exist_ok=True)
-            cv2.imwrite(f"{preview_path}/{filename}.jpg", img_detection)
+            preview_file = os.path.join(output_path, "preview", f"{filename}.jpg")
+            os.makedirs(os.path.dirname(preview_file), exist_ok=True)
+            self.submit_encode(preview_file, img_detection)
     
     def __init__(self) :
-        self.class_list = ["canister", "foam", "ring", "tyvek", "wafer"]
-        self.color_map = {
-            0: (0, 255, 255),    # canister
-            1: (255, 0, 255),    # foam
-            2: (0, 255, 0),    # ring
-            3: (0, 0, 255),  # tyvek
-            4: (255, 0, 0),  # wafer
-        }
+        # class names, colors and file name patterns, classes.json next to this file replaces the defaults
+        self.class_config = None
+        self.classes = load_class_registry()
+        self.w_ranges = [(0.35, 0.45), (0.49, 0.59)]
+        self.h_ranges = [(0.57, 0.73), (0.77, 0.93)]
+        # ranges estimated from a label corpus by preset_stats.py replace the defaults
+        self.load_ranges()
+        self.batch_size = 1
+        self.conf = 0.5
+        self.decode_workers = 2
+        self.write_workers = 2
+        self.queue_depth = 16
+        self.write_pool = None
+        self.workers = 1
+        self.report_files = ["no_detection", "no_detection_more_than_one", "no_detection_out_of_range", "more_than_two_detection", "unknown_class"]
+        self.use_manifest = True
+        self.manifest_hash = False
+        self.manifest = None
+        self.image_futures = []
+        self.structured_report = None
+        self.report = None
+        self.transfer_mode = "copy"
+        self.backend = "auto"
+        self.decode_scale = 1
+        self.imgsz = None
+        self.time_to_first_label = None
+        # progress of the current run, read by the window from the Tk thread
+        self.cancel_event = threading.Event()
+        self.progress_lock = threading.Lock()
+        self.progress_queue = None
+        self.processed = 0
+        self.status_counts = {}
+        self.cancelled = False
+        self.elapsed = 0.0
+        # per stage timing, off unless set_timing is called
+        self.timer = StageTimer()
+        self.profile = None
+        # duplicate input images, inference runs once per group
+        self.dedup = False
+        self.perceptual_dedup = False
+        self.duplicates = {}
+        # overlay images in output/detections and output/preview, and how they are encoded
+        self.overlay_mode = "all"
+        self.overlay_every = 1
+        self.overlay_index = 0
+        self.encode_format = "jpg"
+        self.encode_quality = None
+        self.png_compression = None
+        self.encode_workers = 2
+        self.encoder = None
+        # input images in subfolders, mirrored into every output folder
+        self.recursive = False
+        self.output_subfolders = set()
+        self.skipped = 0
 
     def detect_class_id_from_filename(self, filename):
-        filename_lower = filename.lower()
-        for i, cls_name in enumerate(self.class_list):
-            if filename_lower.startswith(cls_name + "_"):
-                return i  # return index id
-        return 0  # ถ้าไม่เจอ class ให้ default เป็น 0
+        # None : no class pattern matches, the image is reported as unknown_class instead of labeled as class 0
+        return self.classes.match(filename)
+
+    def load_classes(self, config_path = None) :
+        # None : the default classes.json next to this file, if there is one
+        self.classes = load_class_registry(config_path)
+        self.class_config = config_path
     
     def set_model(self,model) :
-        self.model = YOLO(model)
+        self.model_path = model
+        # warmed up at the inference size, set_resolution comes first when imgsz is set
+        self.model = model_manager.get(model, self.backend, self.imgsz)
+        if model_manager.load_time or model_manager.warmup_time :
+            print(f"model : {model} loaded in {model_manager.load_time:.2f}s, warm-up {model_manager.warmup_time:.2f}s")
+        else :
+            print(f"model : {model} (cached)")
+
+    def set_backend(self, backend = "auto") :
+        # auto : .onnx files run on onnxruntime, everything else on the ultralytics PyTorch model
+        if backend not in BACKENDS :
+            raise ValueError(f"unknown backend: {backend}")
+        self.backend = backend
+
+    def set_resolution(self, decode_scale = 1, imgsz = None) :
+        # decode at 1/2, 1/4 or 1/8 size (JPEG is scaled inside the decoder) and run the model at imgsz
+        # labels are normalized by the decoded size, so the txt output stays the same within tolerance
+        if int(decode_scale) not in DECODE_FLAGS :
+            raise ValueError(f"decode scale must be one of {sorted(DECODE_FLAGS)}")
+        self.decode_scale = int(decode_scale)
+        self.imgsz = int(imgsz) if imgsz else None
+
+    def set_warmup(self, warmup_imgsz = None, warmup_runs = 1) :
+        # dummy inferences run once per newly loaded model, at imgsz unless warmup_imgsz is given
+        model_manager.set_warmup(int(warmup_imgsz) if warmup_imgsz else None, int(warmup_runs))
     
     def set_class(self, class_name=0) :
         self.class_name = class_name
@@ -67,23 +167,44 @@ class program :
             print(f"An error occurred: {e}")
     
     def list_files_in_folder(self,folder_path):
-        list_name_file = []
-        # List all files in the specified folder
-        with os.scandir(folder_path) as entries:
-            for entry in entries:
-                if entry.is_file():
-                    list_name_file.append(entry.name)
-        return list_name_file
+        # image files only, in name order, subfolders too when recursive is set
+        return [entry.name for entry in scan_files(folder_path, recursive = self.recursive)]
 
-    def find_file_name(self,file_path) :
-        # Get the file name with extension
-        file_name_with_extension = os.path.basename(file_path)
+    def set_recursive(self, recursive = False) :
+        self.recursive = recursive
 
-        # Split the file name and extension
-        file_name, file_extension = os.path.splitext(file_name_with_extension)
+    def find_file_name(self,file_path) :
+        # name without extension, files in subfolders keep their relative folder ("sub/name")
+        file_name, file_extension = os.path.splitext(file_path)
 
         return file_name
 
+    def create_output_subfolder(self, file_name) :
+        # the subfolder of a nested input file is created once in every output folder
+        subfolder = os.path.dirname(file_name)
+        if not subfolder or subfolder in self.output_subfolders :
+            return
+        for folder in (self.detection_path, self.label_path, self.image_path, self.no_detection_path, self.no_detection_label_path) :
+            os.makedirs(os.path.join(folder, subfolder), exist_ok = True)
+        self.output_subfolders.add(subfolder)
+
+    def filter_pending(self, input_path, entries) :
+        # names of scanned files that still need labeling, the scan already read their size and mtime
+        names = [entry.name for entry in entries]
+        if self.manifest is None :
+            return names
+        return self.manifest.filter_pending(input_path, names, {entry.name : (entry.size, entry.mtime_ns) for entry in entries})
+
+    def iter_pending(self, input_path) :
+        # runs on the decode producer thread, the first chunk is labeled while the folder is still being scanned
+        # scandir order, no directory listing is held in memory
+        for chunk in scan_chunks(input_path, recursive = self.recursive, sort = False) :
+            pending = self.filter_pending(input_path, chunk)
+            with self.progress_lock :
+                self.skipped += len(chunk) - len(pending)
+                self.total += len(pending)
+            yield from pending
+
     def create_output_folder(self, output_path) :
         detection_path = "{path}/output/detections".format(path = output_path)
         no_detection_path = "{path}/output/no detections".format(path = output_path)
@@ -99,6 +220,7 @@ class program :
         self.label_path = label_path
         self.image_path = image_path
         self.no_detection_path = no_detection_path
+        self.manifest_path = "{path}/output/manifest.jsonl".format(path = output_path)
 
     def create_report_folder(self, output_path,no_detection_file = True, more_than_two_detection = True) :
         path = r"{path}/report".format(path = output_path)
@@ -111,29 +233,419 @@ class program :
         # if more_than_two_detection :
         #     open("{f}.txt".format(f = "more_than_two_detection"),"w")
 
+    def set_transfer_mode(self, transfer_mode = "copy") :
+        # how input images are routed into output/images and output/no detections
+        if transfer_mode not in TRANSFER_MODES :
+            raise ValueError(f"unknown transfer mode: {transfer_mode}")
+        self.transfer_mode = transfer_mode
+
     def copy_files(self,source_path, output_path) :
-        shutil.copy(source_path, output_path)
+        transfer_file(source_path, output_path, self.transfer_mode)
         #print(f"File copied from {source_path} to {output_path}")
         return
+
+    def route_image(self, source_path, destinations) :
+        # one task per image, so a move never races with another transfer of the same file
+        transfer_to_all(source_path, destinations, self.transfer_mode)
     
+    def set_ranges(self, w_ranges, h_ranges) :
+        self.w_ranges = [tuple(r) for r in w_ranges]
+        self.h_ranges = [tuple(r) for r in h_ranges]
+
+    def load_ranges(self, config_path = None) :
+        # None : the default presets.json next to this file, if there is one
+        config = load_preset_config(config_path) if config_path else load_preset_config()
+        if config_path and config is None :
+            raise FileNotFoundError(config_path)
+        # a config estimated from a degenerate corpus has presets but no ranges
+        if config is not None and "w_ranges" in config :
+            self.set_ranges(config["w_ranges"], config["h_ranges"])
+            # the ranges decide which boxes are rejected, say where they came from
+            print(f"acceptance ranges from {config_path or PRESET_CONFIG} : w {self.w_ranges} h {self.h_ranges}")
+
     def check_w_h_range(self, w, h):
-        w_ranges = [(0.35, 0.45), (0.49, 0.59)]
-        w_valid = any(lower <= w <= upper for (lower, upper) in w_ranges)
+        w_valid = any(lower <= w <= upper for (lower, upper) in self.w_ranges)
         
-        h_ranges = [(0.57, 0.73), (0.77, 0.93)]
-        h_valid = any(lower <= h <= upper for (lower, upper) in h_ranges)
+        h_valid = any(lower <= h <= upper for (lower, upper) in self.h_ranges)
 
         if w_valid and h_valid:
             return True
         else:
             return False
         
+    def check_w_h_range_array(self, w, h):
+        # same rule as check_w_h_range for arrays of normalized w and h
+        w_valid = np.zeros(w.shape, dtype=bool)
+        for lower, upper in self.w_ranges :
+            w_valid |= (lower <= w) & (w <= upper)
+        h_valid = np.zeros(h.shape, dtype=bool)
+        for lower, upper in self.h_ranges :
+            h_valid |= (lower <= h) & (h <= upper)
+        return w_valid & h_valid
+
     def check_single_detection(self, detections):
         return detections.xywh.shape[0] == 1
 
-    def run(self) :
-        count = 0
-        model = self.model
+    def set_conf(self, conf = 0.5) :
+        self.conf = float(conf)
+
+    def set_batch_size(self, batch_size = 1) :
+        self.batch_size = max(1, int(batch_size))
+
+    def set_pipeline(self, decode_workers = 2, write_workers = 2, queue_depth = 16) :
+        self.decode_workers = max(1, int(decode_workers))
+        self.write_workers = max(1, int(write_workers))
+        # max decoded images waiting in front of the model
+        self.queue_depth = max(1, int(queue_depth))
+
+    def set_workers(self, workers = 1) :
+        # number of processes, each one loads its own model
+        self.workers = max(1, int(workers))
+
+    def set_timing(self, enabled = False, profile = None) :
+        # enabled : report/timing.txt and timing.json per run, profile : None, "cprofile" or "pyinstrument"
+        if profile not in (None, *PROFILERS) :
+            raise ValueError(f"unknown profiler: {profile}")
+        self.timer = StageTimer(enabled)
+        self.profile = profile
+
+    def set_overlay(self, overlay_mode = "all", every = 1) :
+        # off writes only the label txt files, drawing and encoding often cost more than inference
+        if overlay_mode not in OVERLAY_MODES :
+            raise ValueError(f"unknown overlay mode: {overlay_mode}")
+        self.overlay_mode = overlay_mode
+        self.overlay_every = max(1, int(every))
+
+    def set_encoding(self, encode_format = "jpg", quality = None, png_compression = None, workers = 2) :
+        # None keeps the OpenCV default of that setting
+        if encode_format not in ENCODE_FORMATS :
+            raise ValueError(f"unknown encode format: {encode_format}")
+        self.encode_format = encode_format
+        self.encode_quality = quality
+        self.png_compression = png_compression
+        self.encode_workers = max(1, int(workers))
+
+    def overlay_wanted(self, flagged) :
+        # every Nth counts the images that could get an overlay, in the order they are labeled
+        index = self.overlay_index
+        self.overlay_index += 1
+        return wants_overlay(self.overlay_mode, index, self.overlay_every, flagged)
+
+    def set_dedup(self, dedup = False, perceptual = False) :
+        # dedup : files with the same bytes share one inference, perceptual : also re-encoded / resized copies
+        self.dedup = dedup or perceptual
+        self.perceptual_dedup = perceptual
+
+    def find_duplicates(self, input_path, list_file_name) :
+        # hashes are cached next to the manifest, a rerun only stats the files
+        output_folder = os.path.dirname(self.manifest_path)
+        if self.perceptual_dedup :
+            cache = HashCache("{path}/perceptual_hashes.jsonl".format(path = output_folder), perceptual_hash)
+        else :
+            cache = HashCache("{path}/hashes.jsonl".format(path = output_folder), fast_hash)
+        try :
+            with self.timer.stage("hash") :
+                return hash_files(input_path, list_file_name, cache, self.decode_workers)
+        finally :
+            cache.close()
+
+    def write_duplicate_report(self, groups) :
+        # duplicates.txt lists every copy that is not the first one, like the other reports
+        with open("{path}/duplicates.txt".format(path = self.report_path), "w") as file :
+            file.writelines("{f} \n".format(f = self.find_file_name(f)) for others in groups.values() for f in others)
+        with open("{path}/duplicate_groups.json".format(path = self.report_path), "w") as file :
+            json.dump(groups, file, indent = 2)
+
+    def cancel(self) :
+        # the run stops at the next batch boundary, finished images stay recorded in the manifest
+        self.cancel_event.set()
+
+    def add_progress(self, processed, counts) :
+        with self.progress_lock :
+            self.processed += processed
+            for key, n in counts.items() :
+                self.status_counts[key] = self.status_counts.get(key, 0) + n
+
+    def progress(self) :
+        # snapshot for the window : images done, images/s, ETA in seconds and per category counts
+        with self.progress_lock :
+            processed = self.processed
+            counts = dict(self.status_counts)
+        elapsed = time.perf_counter() - self.perf_start if getattr(self, "perf_start", None) else 0.0
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        total = getattr(self, "total", 0)
+        eta = (total - processed) / rate if rate > 0 else None
+        return {"processed" : processed, "total" : total, "rate" : rate, "eta" : eta, "counts" : counts}
+
+    def shard_settings(self) :
+        return {
+            "model" : self.model_path,
+            "input_path" : self.input_path,
+            "output_path" : self.output_path,
+            "class_name" : self.class_name,
+            "no_detection_file" : self.no_detection_file,
+            "more_than_two_detection" : self.more_than_two_detection,
+            "batch_size" : self.batch_size,
+            "conf" : self.conf,
+            "decode_workers" : self.decode_workers,
+            "write_workers" : self.write_workers,
+            "queue_depth" : self.queue_depth,
+            "use_manifest" : self.use_manifest,
+            "structured_report" : self.structured_report,
+            "transfer_mode" : self.transfer_mode,
+            "backend" : self.backend,
+            "decode_scale" : self.decode_scale,
+            "imgsz" : self.imgsz,
+            "w_ranges" : self.w_ranges,
+            "h_ranges" : self.h_ranges,
+            "class_config" : self.class_config,
+            "warmup_imgsz" : model_manager.warmup_imgsz,
+            "warmup_runs" : model_manager.warmup_runs,
+            "run_start" : self.run_start,
+            "timing" : self.timer.enabled,
+            "overlay_mode" : self.overlay_mode,
+            "overlay_every" : self.overlay_every,
+            "encode_format" : self.encode_format,
+            "encode_quality" : self.encode_quality,
+            "png_compression" : self.png_compression,
+            "encode_workers" : self.encode_workers,
+            "manifest_params" : self.manifest_params(),
+            "duplicates" : self.duplicates,
+        }
+
+    def split_shards(self, list_file_name, workers) :
+        # contiguous chunks, merging the shard reports in order gives the same order as one process
+        n = len(list_file_name)
+        return [list_file_name[k * n // workers:(k + 1) * n // workers] for k in range(workers)]
+
+    def merge_shard_reports(self, shard_paths) :
+        for report_name in self.report_files :
+            lines = []
+            for shard_path in shard_paths :
+                shard_file = "{path}/{f}.txt".format(path = shard_path, f = report_name)
+                if os.path.exists(shard_file) :
+                    with open(shard_file, "r") as file :
+                        lines.extend(file.readlines())
+            if lines :
+                with open("{path}/{f}.txt".format(path = self.report_path, f = report_name), "a") as file :
+                    file.writelines(lines)
+        if self.structured_report is not None :
+            records = []
+            for shard_path in shard_paths :
+                shard_file = structured_report_file(shard_path, self.structured_report)
+                if os.path.exists(shard_file) :
+                    with open(shard_file, "r", newline = "") as file :
+                        lines = file.readlines()
+                    # csv shards start with their own header
+                    records.extend(lines[1:] if self.structured_report == "csv" else lines)
+            if records :
+                report_file = structured_report_file(self.report_path, self.structured_report)
+                header = self.structured_report == "csv" and (not os.path.exists(report_file) or os.path.getsize(report_file) == 0)
+                with open(report_file, "a", newline = "") as file :
+                    if header :
+                        write_records(file, [], "csv", header = True)
+                    file.writelines(records)
+        if self.manifest is not None :
+            for shard_path in shard_paths :
+                self.manifest.merge("{path}/manifest.jsonl".format(path = shard_path))
+            self.manifest.flush()
+        for shard_path in shard_paths :
+            shutil.rmtree(shard_path, ignore_errors = True)
+
+    def run_sharded(self, list_file_name) :
+        if not list_file_name :
+            # everything is up to date, no worker processes and no model loads
+            self.count = 0
+            self.percent = "0.00%"
+            return
+        workers = min(self.workers, max(1, len(list_file_name)))
+        settings = self.shard_settings()
+        shards = self.split_shards(list_file_name, workers)
+        shard_paths = ["{path}/shard_{k}".format(path = self.report_path, k = k) for k in range(workers)]
+        keys = [None] * workers
+        if self.manifest is not None :
+            keys = [{name : self.manifest.keys.pop(name) for f in shard for name in [f, *self.duplicates.get(f, ())]} for shard in shards]
+        # progress and cancel cross the process boundary through a manager
+        manager = multiprocessing.Manager()
+        progress_queue = manager.Queue()
+        cancel_event = manager.Event()
+        try :
+            with ProcessPoolExecutor(max_workers = workers) as pool :
+                futures = [pool.submit(run_shard, settings, k, shards[k], shard_paths[k], workers, keys[k], progress_queue, cancel_event) for k in range(workers)]
+                pending = set(futures)
+                while pending :
+                    done, pending = wait(pending, timeout = 0.2)
+                    if self.cancel_event.is_set() :
+                        cancel_event.set()
+                    self.drain_progress(progress_queue)
+                self.drain_progress(progress_queue)
+                counts = []
+                for future in futures :
+                    count, time_to_first_label, samples = future.result()
+                    counts.append(count)
+                    if samples is not None :
+                        self.timer.merge(samples)
+                    if time_to_first_label is not None :
+                        self.time_to_first_label = min(time_to_first_label, self.time_to_first_label or time_to_first_label)
+        finally :
+            manager.shutdown()
+            # keep whatever the workers finished, even if one of them failed
+            self.merge_shard_reports(shard_paths)
+        self.count = sum(counts)
+        self.percent = f'{self.count/max(1, self.total)*100:.2f}%'
+
+    def drain_progress(self, progress_queue) :
+        while True :
+            try :
+                processed, counts = progress_queue.get_nowait()
+            except queue.Empty :
+                return
+            self.add_progress(processed, counts)
+
+    def set_structured_report(self, structured_report = None) :
+        # None, "jsonl" or "csv" : one record per image in report/report.<fmt>
+        if structured_report not in (None, "jsonl", "csv") :
+            raise ValueError(f"unknown structured report format: {structured_report}")
+        self.structured_report = structured_report
+
+    def set_manifest(self, use_manifest = True, use_hash = False) :
+        # skip images that are already done in a previous run of the same output folder
+        self.use_manifest = use_manifest
+        self.manifest_hash = use_hash
+
+    def manifest_params(self) :
+        # a different model means every image has to be labeled again
+        model_path = getattr(self, "model_path", None)
+        model_mtime = None
+        if model_path is not None and os.path.exists(model_path) :
+            model_mtime = os.stat(model_path).st_mtime_ns
+        return {"model" : model_path, "model_mtime" : model_mtime, "backend" : self.backend, "conf" : self.conf,
+                "decode_scale" : self.decode_scale, "imgsz" : self.imgsz, "w_ranges" : self.w_ranges, "h_ranges" : self.h_ranges,
+                "classes" : self.classes.params()}
+
+    def recover_shards(self) :
+        # shard folders left over from a crashed multi-process run
+        shard_paths = sorted(glob.glob("{path}/shard_*".format(path = self.report_path)))
+        if shard_paths :
+            self.merge_shard_reports(shard_paths)
+
+    def commit_records(self, wait = False) :
+        # an image is marked done only after all of its writes have landed
+        while self.pending_records :
+            f, outcome, futures = self.pending_records[0]
+            if not wait and not all(future.done() for future in futures) :
+                break
+            self.pending_records.popleft()
+            if all(future.exception() is None for future in futures) :
+                self.manifest.record(f, outcome)
+        self.manifest.flush()
+
+    def rewrite_reports(self) :
+        # rebuild the report files from the manifest, a rerun never duplicates a line
+        lines = {report_name : [] for report_name in self.report_files}
+        for entry in self.manifest.current_entries() :
+            for report_name in entry["outcome"].get("reports", []) :
+                lines[report_name].append("{f} \n".format(f = self.find_file_name(entry["name"])))
+        for report_name, report_lines in lines.items() :
+            report_file = "{path}/{f}.txt".format(path = self.report_path, f = report_name)
+            if report_lines or os.path.exists(report_file) :
+                with open(report_file, "w") as file :
+                    file.writelines(report_lines)
+        if self.structured_report is not None :
+            records = [dict(file = entry["name"], **entry["outcome"]) for entry in self.manifest.current_entries()]
+            with open(structured_report_file(self.report_path, self.structured_report), "w", newline = "") as file :
+                write_records(file, records, self.structured_report, header = True)
+
+    def read_image(self, input_path, file_name) :
+        with self.timer.stage("read") :
+            return cv2.imread("{path}/{f}".format(path = input_path, f = file_name), DECODE_FLAGS[self.decode_scale])
+
+    def predict(self, images) :
+        # N images in one call, imgsz only when it was set so the model keeps its own default
+        if self.imgsz is None :
+            return self.model(images, conf = self.conf, verbose = False)
+        return self.model(images, conf = self.conf, imgsz = self.imgsz, verbose = False)
+
+    def write_label(self, label_file, text) :
+        # all lines of an image are written at once, a re-labeled image replaces its old file
+        with open(label_file, "w") as file :
+            file.write(text)
+
+    def submit_write(self, fn, *args) :
+        # run on the writer pool during run(), inline otherwise
+        if self.write_pool is None :
+            fn(*args)
+            return
+        self.track_write(self.write_pool.submit(fn, *args))
+
+    def submit_encode(self, image_file, img) :
+        # overlays are encoded on their own pool, a slow encode never holds up label files and copies
+        if self.encoder is None :
+            ImageEncoder(self.encode_format, self.encode_quality, self.png_compression, 0, self.timer).submit(image_file, img)
+            return
+        self.track_write(self.encoder.submit(image_file, img))
+
+    def track_write(self, future) :
+        self.pending_writes.append(future)
+        self.image_futures.append(future)
+        # each image queues up to 3 writes (overlay, label, copy), keep memory bounded
+        while len(self.pending_writes) > self.queue_depth * 3 :
+            self.pending_writes.popleft().result()
+
+    def wait_writes(self) :
+        while self.pending_writes :
+            self.pending_writes.popleft().result()
+
+    def put_queue(self, decode_queue, item, stop_event) :
+        while not stop_event.is_set() :
+            try :
+                decode_queue.put(item, timeout = 0.1)
+                return True
+            except queue.Full :
+                pass
+        return False
+
+    def prefetch_images(self, input_path, list_file_name, decode_queue, stop_event) :
+        # producer : decode ahead of the model, the bounded queue blocks when it is full
+        # list_file_name may be iter_pending, scanning errors happen on this thread and are re-raised by iter_batches
+        try :
+            with ThreadPoolExecutor(max_workers = self.decode_workers) as decode_pool :
+                for f in list_file_name :
+                    if all(self.detect_class_id_from_filename(name) is None for name in [f, *self.duplicates.get(f, ())]) :
+                        # no class for the file (or any of its copies), it is routed without decoding or inference
+                        future = None
+                    else :
+                        future = decode_pool.submit(self.read_image, input_path, f)
+                    if not self.put_queue(decode_queue, (f, future), stop_event) :
+                        return
+        except Exception as e :
+            self.producer_error = e
+        finally :
+            # the consumer always gets the end of the queue, even when the producer failed
+            self.put_queue(decode_queue, None, stop_event)
+
+    def iter_batches(self, decode_queue, batch_size) :
+        batch = []
+        while True :
+            try :
+                item = decode_queue.get(timeout = 0.2)
+            except queue.Empty :
+                # a cancelled run stops waiting for a producer that may be stuck on a slow folder
+                if self.cancel_event.is_set() :
+                    return
+                continue
+            if item is None :
+                if self.producer_error is not None :
+                    raise self.producer_error
+                break
+            batch.append(item)
+            if len(batch) == batch_size :
+                yield batch
+                batch = []
+        if batch :
+            yield batch
+
+    def label_image(self, file_name, img, detections) :
         #input path
         input_path = self.input_path
         #output path
@@ -142,123 +654,343 @@ class program :
         image_path = self.image_path
         detection_path = self.detection_path
         no_detection_path = self.no_detection_path
-        #report path
-        report_path = self.report_path
-        #class name
-        class_name = self.class_name
+        #report
+        report = self.report
         #set datalog
         no_detection_file = self.no_detection_file
         more_than_two_detection = self.more_than_two_detection
-        #list of input file name
-        list_file_name = self.list_files_in_folder(input_path)
-        
-        for i in tqdm(range((len(list_file_name))), desc="Processing") :
-            #read image
-            img = cv2.imread("{path}/{f}".format(path = input_path,f = list_file_name[i])) 
-            #get h and w of image
-            height, width = img.shape[:2]
-            #prediction
-            results = model(img, conf = 0.5, verbose = False)
-            detections = results[0].boxes
-            cls_t = detections.cls
-            if not self.check_single_detection(detections):
-                # ถ้ามีมากกว่า 1 detection → จัดเป็น no detection
-                no_detection_file = open("{path}/{f}.txt".format(path = report_path,f = "no_detection_more_than_one"),"a")
-                no_detection_file.write("{f} \n".format(f = self.find_file_name(list_file_name[i])))
-                no_detection_file.close()
-                self.copy_files("{path}/{f}".format(path = input_path, f = list_file_name[i]),"{path}/{f}".format(path = no_detection_path , f = list_file_name[i]))
-                continue  # skip การประมวลผลภาพนี้ทันที
-            if no_detection_file :
-                if cls_t.numel() == 0 :
-                    #create file log-no detection
-                    no_detection_file = open("{path}/{f}.txt".format(path = report_path,f = "no_detection"),"a")
-                    no_detection_file.write("{f} \n".format(f = self.find_file_name(list_file_name[i])))
-                    self.copy_files("{path}/{f}".format(path = input_path, f = list_file_name[i]),"{path}/{f}".format(path = no_detection_path , f = list_file_name[i]))
-                    no_detection_file.close()
-                    #create label
-                    with open("{no_detection_label_path}/{f}.txt".format(no_detection_label_path = self.no_detection_label_path, f = self.find_file_name(list_file_name[i])), "w") as file:
-                        file.write("")
-                    #print("no detection")
-                    #print("the path of this file is {path}\{f}".format(path = folder_path, f = list_file_name[i]))
-            if cls_t.numel() == 0 :
-                pass
+        #get h and w of image
+        height, width = img.shape[:2]
+        # one device -> host copy per image instead of .item() per value
+        xywh = to_numpy(detections.xywh).astype(np.float64)
+        conf = to_numpy(detections.conf)
+        rows = xywh.shape[0]
+        # normalize every box at once
+        norm = xywh / np.array([width, height, width, height])
+        # overlay of this image only, the decoded frame itself is never drawn on
+        img_detection = None
+        self.image_futures = []
+        reports = []
+        destinations = []
+        # class from the file name, once per image for all of its boxes
+        class_id = self.detect_class_id_from_filename(file_name)
+        if class_id is None :
+            # only reached by a copy whose first file has a class, other unknown files are never decoded
+            return self.reject_unknown_class(file_name, conf, norm)
+        if rows != 1 :
+            # ถ้ามีมากกว่า 1 detection → จัดเป็น no detection
+            reports.append("no_detection_more_than_one")
+            report.add("no_detection_more_than_one", self.find_file_name(file_name))
+            destinations.append("{path}/{f}".format(path = no_detection_path , f = file_name))
+            self.submit_write(self.timer.wrap("copy", self.route_image), "{path}/{f}".format(path = input_path, f = file_name), destinations)
+            self.submit_flagged_overlay(file_name, img, xywh, conf, class_id)
+            return self.image_outcome(file_name, "no_detection_more_than_one", reports, conf, norm)  # skip การประมวลผลภาพนี้ทันที
+        if no_detection_file :
+            if rows == 0 :
+                #create file log-no detection
+                reports.append("no_detection")
+                report.add("no_detection", self.find_file_name(file_name))
+                destinations.append("{path}/{f}".format(path = no_detection_path , f = file_name))
+                #create label
+                with open("{no_detection_label_path}/{f}.txt".format(no_detection_label_path = self.no_detection_label_path, f = self.find_file_name(file_name)), "w") as file:
+                    file.write("")
+        label_lines = []
+        overlay = False
+        if rows > 0 :
+            valid = self.check_w_h_range_array(norm[:, 2], norm[:, 3])
+            if not valid.all() :
+                # ถ้าไม่อยู่ในช่วง → จัดไฟล์เป็น no detection
+                reports.append("no_detection_out_of_range")
+                report.add("no_detection_out_of_range", self.find_file_name(file_name))
+                destinations.append("{path}/{f}".format(path = no_detection_path , f = file_name))
+            # ข้ามการสร้าง label สำหรับ bounding box ที่ไม่อยู่ในช่วง
+            if valid.any() :
+                # flagged : out of range boxes or more than two detections
+                overlay = self.overlay_wanted(bool(reports) or (more_than_two_detection and rows >= 2))
+                if overlay :
+                    img_detection = self.draw_detections(img, xywh[valid], conf[valid], class_id)
+                label_lines = ["{cls} {x} {y} {w} {h} \n".format(cls = class_id, x = x, y = y, w = w, h = h) for x, y, w, h in norm[valid].tolist()]
             else :
-                x_t,y_t,w_t,h_t = detections.xywh[0]
-                #print(detections.xywh)
-                # Get the dimensions of the tensor
-                rows, cols = detections.xywh.shape
-                # labeling
-                for j in range(rows) :
-                    x_t,y_t,w_t,h_t = detections.xywh[j]
-                    x = x_t.item()/width
-                    y = y_t.item()/height
-                    w = w_t.item()/width
-                    h = h_t.item()/height
-
-                    if not self.check_w_h_range(w, h):
-                        # ถ้าไม่อยู่ในช่วง → จัดไฟล์เป็น no detection
-                        no_detection_file = open("{path}/{f}.txt".format(path = report_path,f = "no_detection_out_of_range"),"a")
-                        no_detection_file.write("{f} \n".format(f = self.find_file_name(list_file_name[i])))
-                        no_detection_file.close()
-                        self.copy_files("{path}/{f}".format(path = input_path, f = list_file_name[i]),"{path}/{f}".format(path = no_detection_path , f = list_file_name[i]))
-                        continue  # ข้ามการสร้าง label สำหรับ bounding box นี้
-                    # detection
-                    #strat
-                    start_x = round(x_t.item()) - round(w_t.item()//2) 
-                    start_y = round(y_t.item()) - round(h_t.item()//2)
-                    #print(start_x,start_y)
-                    #end
-                    end_x = round(start_x + w_t.item()) 
-                    end_y = round(start_y + h_t.item()) 
-                    #print(end_x,end_y) 
-                    img_detection = img
-
-                    #cv2.rectangle(img_detection,(start_x,start_y),(end_x,end_y),(255,0,0),2)
-
-                    # ดึง class id จาก filename (ตามระบบคุณ)
-                    class_id = self.detect_class_id_from_filename(list_file_name[i])
-                    # ดึงสีของ class จาก color_map
-                    color = self.color_map[class_id]
-                    # วาดกรอบด้วยสีของแต่ละ class
-                    cv2.rectangle(img_detection, (start_x, start_y), (end_x, end_y), color, 2)
-                    # ใส่ชื่อ class + confidence (สมมุติ confidence ไม่มีในตอนนี้ใส่ class name ก่อน)
-                    #label_text = f"{self.class_list[class_id]}"
-                    #cv2.putText(img_detection, label_text, (start_x, start_y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                    # ดึง confidence ของแต่ละ detection (สำคัญมาก ตรงนี้เพิ่มใหม่)
-                    confidence = detections.conf[j].item()
-
-                    # แสดงทั้ง class name และ confidence
-                    label_text = f"{self.class_list[class_id]} {confidence:.2f}"
-                    cv2.putText(img_detection, label_text, (start_x, start_y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                    cv2.imwrite("{path}/{f}.jpg".format(path = detection_path,f=self.find_file_name(list_file_name[i])),img_detection)
-                    #create file
-                    file = open("{path}/{f}.txt".format(path = label_path , f = self.find_file_name(list_file_name[i])), "a")
-                    #write file
-                    class_id = self.detect_class_id_from_filename(list_file_name[i])
-                    file.write("{cls} {x} {y} {w} {h} \n".format(cls = class_id, x = x, y = y, w = w, h = h))
-                    #file.write("{cls} {x} {y} {w} {h} \n".format(cls = int(class_name),x = x,y = y,w = w,h = h))
-                    #close file
-                    file.close()
-            rows, cols = detections.xywh.shape
-            if more_than_two_detection :
-                if rows >= 2 : 
-                    more_than_two_detection_file = open("{path}/{f}.txt".format(path = report_path, f = "more_than_two_detection"),"a") 
-                    more_than_two_detection_file.write("{f} \n".format(f =  self.find_file_name(list_file_name[i])))
-                    more_than_two_detection_file.close()
-            self.copy_files("{path}/{f}".format(path = input_path, f = list_file_name[i]), "{path}/{f}".format(path = image_path , f = list_file_name[i]))
-            count += 1
-            percent = count/len(list_file_name)
-            self.percent = f'{percent*100:.2f}%'
-            self.save_random_preview(img_detection, self.find_file_name(list_file_name[i]), output_path)
+                # every box out of range, nothing is labeled but the image is worth reviewing
+                self.submit_flagged_overlay(file_name, img, xywh, conf, class_id)
+        if overlay :
+            # the frame is not drawn on after this point, safe to hand it to the encode pool
+            self.submit_encode("{path}/{f}.jpg".format(path = detection_path,f=self.find_file_name(file_name)),img_detection)
+        if label_lines :
+            self.submit_write(self.timer.wrap("label write", self.write_label), "{path}/{f}.txt".format(path = label_path , f = self.find_file_name(file_name)), "".join(label_lines))
+        if more_than_two_detection :
+            if rows >= 2 :
+                reports.append("more_than_two_detection")
+                report.add("more_than_two_detection", self.find_file_name(file_name))
+        destinations.append("{path}/{f}".format(path = image_path , f = file_name))
+        self.submit_write(self.timer.wrap("copy", self.route_image), "{path}/{f}".format(path = input_path, f = file_name), destinations)
+        self.count += 1
+        percent = self.count/self.total
+        self.percent = f'{percent*100:.2f}%'
+        # previews are sampled from the drawn frames, every image can be sampled only with overlays on all of them
+        if self.overlay_mode == "all" or overlay :
+            self.save_random_preview(img if img_detection is None else img_detection, self.find_file_name(file_name), output_path)
+        return self.image_outcome(file_name, "labeled" if label_lines else "no_detection", reports, conf, norm)
+
+    def reject_unknown_class(self, file_name, conf = None, norm = None) :
+        # a file no class pattern matches gets no label, it is reported and routed to no detections
+        self.image_futures = []
+        conf = np.zeros(0) if conf is None else conf
+        norm = np.zeros((0, 4)) if norm is None else norm
+        self.report.add("unknown_class", self.find_file_name(file_name))
+        self.submit_write(self.timer.wrap("copy", self.route_image), "{path}/{f}".format(path = self.input_path, f = file_name), ["{path}/{f}".format(path = self.no_detection_path, f = file_name)])
+        return self.image_outcome(file_name, "unknown_class", ["unknown_class"], conf, norm)
 
+    def draw_detections(self, img, xywh, conf, class_id) :
+        # one copy per image, every box is drawn on it and it is encoded once
+        # pixel corners, np.rint rounds half to even like round()
+        start = np.rint(xywh[:, :2]) - np.rint(xywh[:, 2:] // 2)
+        end = np.rint(start + xywh[:, 2:])
+        corners = np.hstack([start, end]).astype(int).tolist()
+        # ดึงสีของ class จาก registry
+        color = self.classes.colors[class_id]
+        with self.timer.stage("draw") :
+            img_detection = img.copy()
+            for (start_x, start_y, end_x, end_y), confidence in zip(corners, conf.tolist()) :
+                # วาดกรอบด้วยสีของแต่ละ class
+                cv2.rectangle(img_detection, (start_x, start_y), (end_x, end_y), color, 2)
+                # แสดงทั้ง class name และ confidence
+                label_text = f"{self.classes.names[class_id]} {confidence:.2f}"
+                cv2.putText(img_detection, label_text, (start_x, start_y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        return img_detection
 
+    def submit_flagged_overlay(self, file_name, img, xywh, conf, class_id) :
+        # images rejected before labeling (more than one detection, every box out of range) only get an
+        # overlay in flagged mode, with all of their boxes drawn
+        if self.overlay_mode != "flagged" or len(xywh) == 0 :
+            return
+        img_detection = self.draw_detections(img, xywh, conf, class_id)
+        self.submit_encode("{path}/{f}.jpg".format(path = self.detection_path, f = self.find_file_name(file_name)), img_detection)
+
+    def image_outcome(self, file_name, status, reports, conf, norm) :
+        # reason codes, confidences and box sizes of one image, for the structured report and the manifest
+        outcome = {"status" : status, "reports" : reports, "conf" : conf.tolist(), "w" : norm[:, 2].tolist(), "h" : norm[:, 3].tolist()}
+        self.report.add_record(dict(file = file_name, **outcome))
+        return outcome
+
+    def run(self) :
+        #input path
+        input_path = self.input_path
+        self.count = 0
+        self.timer = StageTimer(self.timer.enabled)
+        self.duplicates = {}
+        self.output_subfolders = set()
+        self.skipped = 0
+        self.total = 0
+        if self.use_manifest :
+            self.manifest = Manifest(self.manifest_path, self.manifest_params(), self.manifest_hash)
+            self.recover_shards()
+        # a single process without dedup labels while the folder is scanned, shards and dedup need the whole list first
+        streaming = self.workers == 1 and not self.dedup
+        if streaming :
+            list_file_name = self.iter_pending(input_path)
+        else :
+            #list of input file name
+            entries = list(scan_files(input_path, recursive = self.recursive))
+            if self.dedup :
+                hashes = self.find_duplicates(input_path, [entry.name for entry in entries])
+                self.write_duplicate_report(group_duplicates([entry.name for entry in entries], hashes))
+            list_file_name = self.filter_pending(input_path, entries)
+            self.skipped = len(entries) - len(list_file_name)
+            self.total = len(list_file_name)
+            if self.use_manifest :
+                print(f"manifest : {self.skipped} images already done, {len(list_file_name)} to process")
+        if self.dedup :
+            # only the first file of a group is decoded and run through the model
+            self.duplicates = group_duplicates(list_file_name, hashes)
+            copies = {f for others in self.duplicates.values() for f in others}
+            list_file_name = [f for f in list_file_name if f not in copies]
+            print(f"dedup : {len(copies)} duplicates of {len(self.duplicates)} images, {len(list_file_name)} to run")
+        start = time.perf_counter()
+        # wall clock, worker processes measure time to first label against it as well
+        self.run_start = time.time()
+        self.time_to_first_label = None
+        self.cancel_event.clear()
+        self.cancelled = False
+        with self.progress_lock :
+            self.processed = 0
+            self.status_counts = {}
+        self.perf_start = start
+        profiler = Profiler(self.profile)
+        profiler.start()
+        try :
+            if self.workers > 1 :
+                self.run_sharded(list_file_name)
+            else :
+                self.process_files(list_file_name, total = None if streaming else self.total)
+        finally :
+            if self.manifest is not None :
+                self.rewrite_reports()
+                self.manifest.close()
+                self.manifest = None
+        self.elapsed = time.perf_counter() - start
+        profile_path = profiler.stop(self.report_path)
+        if profile_path is not None :
+            print(f"profile : {profile_path}")
+        if self.timer.enabled :
+            print(self.timer.write(self.report_path, self.elapsed), end = "")
+        if streaming and self.use_manifest :
+            print(f"manifest : {self.skipped} images already done, {self.total} to process")
+        self.cancelled = self.cancel_event.is_set()
+        if self.cancelled :
+            print(f"cancelled after {self.processed} of {self.total} images")
+        print(f"{self.workers} worker(s) : {self.processed} images in {self.elapsed:.2f}s ({self.processed/max(self.elapsed, 1e-9):.2f} images/s)")
+        if self.time_to_first_label is not None :
+            print(f"time to first label : {self.time_to_first_label:.2f}s")
+
+    def process_files(self, list_file_name, position = 0, total = None) :
+        # total : images for the progress bar, None while iter_pending is still scanning the input folder
+        input_path = self.input_path
+        batch_size = self.batch_size
+
+        decode_queue = queue.Queue(maxsize = self.queue_depth)
+        stop_event = threading.Event()
+        self.producer_error = None
+        producer = threading.Thread(target = self.prefetch_images, args = (input_path, list_file_name, decode_queue, stop_event), daemon = True)
+        producer.start()
+        self.pending_writes = deque()
+        self.pending_records = deque()
+        self.write_pool = ThreadPoolExecutor(max_workers = self.write_workers)
+        self.encoder = ImageEncoder(self.encode_format, self.encode_quality, self.png_compression, self.encode_workers, self.timer, self.queue_depth * 2)
+        self.overlay_index = 0
+        self.report = ReportWriter(self.report_path, self.report_files, self.structured_report, timer = self.timer)
+        try :
+            with tqdm(total = total, desc="Processing", position = position) as pbar :
+                for batch in self.iter_batches(decode_queue, batch_size) :
+                    # cancel only between batches, a batch is always labeled completely
+                    if self.cancel_event.is_set() :
+                        break
+                    counts = {}
+                    processed = len(batch) + sum(len(self.duplicates.get(f, ())) for f, future in batch)
+                    #read image
+                    batch_img = []
+                    for f, future in batch :
+                        if future is None :
+                            for name in [f, *self.duplicates.get(f, ())] :
+                                self.create_output_subfolder(name)
+                                outcome = self.reject_unknown_class(name)
+                                counts["unknown_class"] = counts.get("unknown_class", 0) + 1
+                                if self.manifest is not None :
+                                    self.pending_records.append((name, outcome, self.image_futures))
+                            continue
+                        # time the model thread spends waiting for the decoders
+                        with self.timer.stage("decode wait") :
+                            img = future.result()
+                        if img is None :
+                            print(f"Cannot read image: {f}")
+                            for name in [f, *self.duplicates.get(f, ())] :
+                                if self.manifest is not None :
+                                    self.pending_records.append((name, {"status" : "unreadable", "reports" : [], "conf" : [], "w" : [], "h" : []}, []))
+                                counts["unreadable"] = counts.get("unreadable", 0) + 1
+                            continue
+                        batch_img.append((f, img))
+                    if batch_img :
+                        #prediction (N images in one call)
+                        with self.timer.stage("infer") :
+                            results = self.predict([img for f, img in batch_img])
+                        for (f, img), result in zip(batch_img, results) :
+                            # duplicates reuse the frame and the detections of the first file
+                            for name in [f, *self.duplicates.get(f, ())] :
+                                self.create_output_subfolder(name)
+                                with self.timer.stage("postprocess") :
+                                    outcome = self.label_image(name, img, result.boxes)
+                                for key in {outcome["status"], *outcome["reports"]} :
+                                    counts[key] = counts.get(key, 0) + 1
+                                if self.time_to_first_label is None :
+                                    self.time_to_first_label = time.time() - self.run_start
+                                if self.manifest is not None :
+                                    self.pending_records.append((name, outcome, self.image_futures))
+                    if self.manifest is not None :
+                        with self.timer.stage("manifest") :
+                            self.commit_records()
+                    self.add_progress(processed, counts)
+                    if self.progress_queue is not None :
+                        self.progress_queue.put((processed, counts))
+                    if total is None :
+                        pbar.total = self.total
+                    pbar.update(processed)
+            self.wait_writes()
+        finally :
+            stop_event.set()
+            producer.join()
+            self.write_pool.shutdown(wait = True)
+            self.write_pool = None
+            self.encoder.close()
+            self.encoder = None
+            self.report.close()
+            if self.manifest is not None :
+                self.commit_records(wait = True)
+
+
+def run_shard(settings, shard_index, list_file_name, shard_report_path, workers, keys = None, progress_queue = None, cancel_event = None) :
+    # entry point of one worker process, it loads its own model and writes its own report files
+    try :
+        import torch
+        # split the cores between the workers instead of every process using all of them
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    except ImportError :
+        pass
+    auto_label = program()
+    auto_label.set_warmup(settings["warmup_imgsz"], settings["warmup_runs"])
+    auto_label.set_backend(settings["backend"])
+    auto_label.set_resolution(settings["decode_scale"], settings["imgsz"])
+    auto_label.set_model(settings["model"])
+    auto_label.run_start = settings["run_start"]
+    auto_label.set_class(settings["class_name"])
+    auto_label.set_input_path(settings["input_path"])
+    auto_label.set_output_path(settings["output_path"])
+    auto_label.set_batch_size(settings["batch_size"])
+    auto_label.set_conf(settings["conf"])
+    auto_label.set_timing(settings["timing"])
+    auto_label.set_ranges(settings["w_ranges"], settings["h_ranges"])
+    auto_label.load_classes(settings["class_config"])
+    auto_label.set_structured_report(settings["structured_report"])
+    auto_label.set_transfer_mode(settings["transfer_mode"])
+    auto_label.set_pipeline(settings["decode_workers"], settings["write_workers"], settings["queue_depth"])
+    auto_label.set_overlay(settings["overlay_mode"], settings["overlay_every"])
+    auto_label.set_encoding(settings["encode_format"], settings["encode_quality"], settings["png_compression"], settings["encode_workers"])
+    auto_label.create_output_folder(settings["output_path"])
+    auto_label.create_report_folder(settings["output_path"], settings["no_detection_file"], settings["more_than_two_detection"])
+    auto_label.create_folder(shard_report_path)
+    auto_label.report_path = shard_report_path
+    auto_label.count = 0
+    auto_label.duplicates = settings["duplicates"]
+    auto_label.total = len(list_file_name) + sum(len(auto_label.duplicates.get(f, ())) for f in list_file_name)
+    auto_label.progress_queue = progress_queue
+    if cancel_event is not None :
+        auto_label.cancel_event = cancel_event
+    if settings["use_manifest"] :
+        # the parent already filtered the list, the shard manifest only records outcomes
+        auto_label.manifest = Manifest("{path}/manifest.jsonl".format(path = shard_report_path), settings["manifest_params"])
+        auto_label.manifest.keys = keys
+    try :
+        auto_label.process_files(list_file_name, position = shard_index, total = auto_label.total)
+    finally :
+        if auto_label.manifest is not None :
+            auto_label.manifest.close()
+    samples = auto_label.timer.samples if auto_label.timer.enabled else None
+    return auto_label.count, auto_label.time_to_first_label, samples
+
+
+def load_gui() :
+    # Tk and customtkinter are only imported for the window, headless runs never load them
+    global tk, ttk, messagebox, ctk, tkinter
+    import tkinter
+    import tkinter as tk
+    import tkinter.filedialog
+    from tkinter import messagebox
+    from tkinter import ttk
+    import customtkinter as ctk
 
 
 class app :
     def __init__(self) :
-        pass
+        load_gui()
     
     def var(self) :
         self.model_path = tk.StringVar()
@@ -267,6 +999,8 @@ class app :
         self.detection_path = tk.StringVar()
         self.report_path = tk.StringVar()
         self.percent_var = tk.DoubleVar()
+        self.batch_size = tk.StringVar()
+        self.progress_text = tk.StringVar()
         
     def select_model_folder(self) :
         folder =  tkinter.filedialog.askopenfilename()
@@ -321,11 +1055,69 @@ class app :
     
     def start_btn(self) :
         self.auto_label.create_output_folder(self.output_path.get())
-        self.auto_label.create_report_folder(self.output_path.get())
+        self.auto_label.create_report_folder(self.output_path.get(), bool(self.no_detection_report.get()), bool(self.more_than_two.get()))
+        try :
+            self.auto_label.set_batch_size(int(self.batch_size.get()))
+        except ValueError :
+            messagebox.showwarning("Warning", "batch size must be a number")
+            return
         #messagebox.showinfo("Info", "The process in runing plase wait")
         #self.show_custom_message_box()
-        self.auto_label.run()
-        messagebox.showinfo("Info", "The process is finish")
+        # the run goes to a worker thread, the window only polls its progress
+        self.run_error = None
+        self.start_button.configure(state = "disabled")
+        self.cancel_button.configure(state = "normal", text = "cancel")
+        self.progress_bar.set(0)
+        self.run_thread = threading.Thread(target = self.run_worker, daemon = True)
+        self.run_thread.start()
+        self.window_app.after(PROGRESS_INTERVAL_MS, self.poll_progress)
+
+    def run_worker(self) :
+        # no Tk calls here, poll_progress reports the result on the Tk thread
+        try :
+            self.auto_label.run()
+        except Exception as e :
+            self.run_error = e
+
+    def cancel_btn(self) :
+        self.auto_label.cancel()
+        self.cancel_button.configure(state = "disabled", text = "cancelling...")
+
+    def poll_progress(self) :
+        progress = self.auto_label.progress()
+        total = max(1, progress["total"])
+        self.progress_bar.set(progress["processed"] / total)
+        eta = "--:--" if progress["eta"] is None else time.strftime("%H:%M:%S", time.gmtime(progress["eta"]))
+        counts = "  ".join(f"{key} {n}" for key, n in sorted(progress["counts"].items()))
+        self.progress_text.set(f"{progress['processed']}/{progress['total']}  {progress['rate']:.1f} images/s  ETA {eta}\n{counts}")
+        if self.run_thread.is_alive() :
+            self.window_app.after(PROGRESS_INTERVAL_MS, self.poll_progress)
+            return
+        self.start_button.configure(state = "normal")
+        self.cancel_button.configure(state = "disabled", text = "cancel")
+        if self.run_error is not None :
+            messagebox.showerror("Error", f"An error occurred: {self.run_error}")
+        elif self.auto_label.cancelled :
+            messagebox.showinfo("Info", f"The process was cancelled after {progress['processed']} images")
+        else :
+            messagebox.showinfo("Info", "The process is finish")
+
+    def review_btn(self) :
+        # every image the manifest recorded, found in output/images, output/no detections or (transfer none) the input folder
+        if self.output_path.get() == "{emtry}" :
+            messagebox.showwarning("Warning", "select the output folder first")
+            return
+        from gallery import GalleryWindow
+        output_path = self.output_path.get()
+        manifest_path = "{path}/output/manifest.jsonl".format(path = output_path)
+        report_path = "{path}/report".format(path = output_path)
+        if not os.path.exists(manifest_path) and not os.path.isdir(report_path) :
+            messagebox.showwarning("Warning", "no labeled images in the output folder yet")
+            return
+        image_folders = ["{path}/output/images".format(path = output_path), "{path}/output/no detections".format(path = output_path)]
+        if self.input_path.get() != "{emtry}" :
+            image_folders.append(self.input_path.get())
+        GalleryWindow(self.window_app, image_folders, report_path, "{path}/output/detections".format(path = output_path), manifest_path)
         
 
     def about_menu_bar(self) :
@@ -360,6 +1152,7 @@ class app :
         input_label = ctk.CTkLabel(app, text="Input Folder path : ", fg_color="transparent")
         output_label = ctk.CTkLabel(app, text="Output Folder path : ", fg_color="transparent")
         report_label = ctk.CTkLabel(app, text="report path ", fg_color="transparent")
+        batch_size_label = ctk.CTkLabel(app, text="Batch size : ", fg_color="transparent")
         
         #label output
         show_model_label = ctk.CTkLabel(app, textvariable = self.model_path, fg_color="transparent",width=350)
@@ -367,12 +1160,23 @@ class app :
         show_output_label = ctk.CTkLabel(app,  textvariable = self.output_path, fg_color="transparent",width=350)
         check_detection_path = ctk.CTkLabel(app, textvariable = self.detection_path, fg_color="transparent",width=350)
         report_path = ctk.CTkLabel(app, textvariable = self.report_path, fg_color="transparent",width=350)
+        batch_size_entry = ctk.CTkEntry(app, textvariable = self.batch_size, width = 60)
         
         #button
         model_path_button = ctk.CTkButton(app, text = "...", width = 10,command=self.select_model_folder)
         input_path_button = ctk.CTkButton(app, text = "...", width = 10, command=self.select_input_folder)
         output_path_button = ctk.CTkButton(app, text = "...", width = 10, command= self.select_output_path)
         start_button = ctk.CTkButton(app, text="start",width = 20,fg_color = "green",command = self.start_btn)
+        review_button = ctk.CTkButton(app, text="review",width = 20,command = self.review_btn)
+        cancel_button = ctk.CTkButton(app, text="cancel",width = 20,fg_color = "red",state = "disabled",command = self.cancel_btn)
+        self.start_button = start_button
+        self.cancel_button = cancel_button
+
+        #progress
+        progress_bar = ctk.CTkProgressBar(app, width = 450)
+        progress_bar.set(0)
+        progress_label = ctk.CTkLabel(app, textvariable = self.progress_text, fg_color="transparent", justify = "left")
+        self.progress_bar = progress_bar
         
         #check box
         rectangle = ctk.IntVar()
@@ -384,6 +1188,8 @@ class app :
         more_than_two = ctk.IntVar()
         more_than_two.set(1)
         more_than_two_check_box = ctk.CTkCheckBox(app, text = " more than two detection report", variable = more_than_two)
+        self.no_detection_report = no_detection_report
+        self.more_than_two = more_than_two
         
         #pack
         #model
@@ -401,6 +1207,10 @@ class app :
         show_output_label.grid(row = 3, column = 1, padx = 5, pady = 5)
         output_path_button.grid(row = 3, column = 2, padx = 5, pady = 5,sticky = 'w')
         
+        #batch size
+        batch_size_label.grid(row = 4, column = 0, padx = 5, pady = 5, sticky = 'e')
+        batch_size_entry.grid(row = 4, column = 1, padx = 5, pady = 5, sticky = 'w')
+        
         #report
         report_label.grid(row = 6, column = 0, padx = 5, pady = 5, sticky = 'e')
         report_path.grid(row = 6, column = 1)
@@ -413,6 +1223,12 @@ class app :
         
         #start btn
         start_button.grid(row = 8, column = 2, sticky = 'w', pady = 5)
+        review_button.grid(row = 8, column = 1, sticky = 'e', pady = 5)
+        cancel_button.grid(row = 8, column = 0, sticky = 'e', pady = 5)
+
+        #progress
+        progress_bar.grid(row = 9, column = 0, columnspan = 3, padx = 5, pady = 5)
+        progress_label.grid(row = 10, column = 0, columnspan = 3, padx = 5, pady = 5, sticky = 'w')
         
         #btn command
         self.model_path.set(r"{emtry}")
@@ -420,11 +1236,13 @@ class app :
         self.output_path.set(r"{emtry}")
         self.detection_path.set(r"{emtry}")
         self.report_path.set(r"{emtry}")
+        self.batch_size.set("1")
 
         app.config(menu=menubar)
-        app.geometry("570x270+650+200")
+        app.geometry("570x390+650+200")
         app.mainloop()
 
 
-auto_label_app = app()
-auto_label_app.window()
\ No newline at end of file
+if __name__ == "__main__":
+    auto_label_app = app()
+    auto_label_app.window()
\ No newline at end of file
@@ -0,0 +1,172 @@
+import ast
+
+import cv2
+import numpy as np
+
+BACKENDS = ("auto", "torch", "onnx", "openvino")
+
+
+def to_numpy(t):
+    """Host NumPy copy of a torch tensor or array-like."""
+    return t.cpu().numpy() if hasattr(t, "cpu") else np.asarray(t)
+
+
+def load_torch(model_path):
+    from ultralytics import YOLO
+    return YOLO(model_path)
+
+
+def load_model(model_path, backend="auto"):
+    """Load a weight file with one of BACKENDS.
+
+    auto picks onnx for .onnx files and the ultralytics PyTorch model for
+    everything else. openvino is the onnx backend with onnxruntime's
+    OpenVINO execution provider in front of the CPU one.
+    """
+    if backend == "auto":
+        backend = "onnx" if model_path.lower().endswith(".onnx") else "torch"
+    if backend == "torch":
+        return load_torch(model_path)
+    if backend == "onnx":
+        return OnnxModel(model_path)
+    if backend == "openvino":
+        return OnnxModel(model_path, providers=["OpenVINOExecutionProvider", "CPUExecutionProvider"])
+    raise ValueError(f"unknown backend: {backend}")
+
+
+def letterbox(img, new_shape, auto=False, stride=32):
+    """Resize and pad like ultralytics LetterBox(center=True), returns (image, gain, (pad_w, pad_h))."""
+    h, w = img.shape[:2]
+    gain = min(new_shape[0] / h, new_shape[1] / w)
+    new_unpad = (round(w * gain), round(h * gain))
+    dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+    if auto:
+        # minimal rectangle, only pad up to the next stride multiple
+        dw, dh = dw % stride, dh % stride
+    dw, dh = dw / 2, dh / 2
+    if (w, h) != new_unpad:
+        img = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = round(dh - 0.1), round(dh + 0.1)
+    left, right = round(dw - 0.1), round(dw + 0.1)
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return img, gain, (left, top)
+
+
+def nms(boxes, scores, iou_thres):
+    """Greedy NMS over xyxy boxes, same rule as torchvision.ops.nms."""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter)
+        order = rest[iou <= iou_thres]
+    return np.array(keep, dtype=int)
+
+
+class NumpyBoxes:
+    """The part of ultralytics Boxes that the labelers read, backed by NumPy arrays."""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        x1, y1, x2, y2 = xyxy.T
+        self.xywh = np.stack([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], axis=1)
+
+
+class NumpyResult:
+    def __init__(self, boxes, names):
+        self.boxes = boxes
+        self.names = names
+
+
+class OnnxModel:
+    """YOLO detection model exported to ONNX, run with onnxruntime.
+
+    Letterbox preprocessing, NMS and box scaling follow ultralytics, so the
+    label files match the PyTorch backend. Models exported with
+    dynamic=True get the same minimal-padding letterbox as the PyTorch
+    predictor; fixed-size exports are padded to their input size.
+    """
+
+    def __init__(self, model_path, providers=None, imgsz=640, iou=0.7, max_det=300, max_nms=30000):
+        import onnxruntime as ort
+        available = ort.get_available_providers()
+        providers = providers or ["CPUExecutionProvider"]
+        # the first provider is the one that was asked for, the rest are fallbacks for unsupported ops
+        if providers[0] not in available:
+            raise RuntimeError(f"{providers[0]} is not available in this onnxruntime build "
+                               f"(available: {', '.join(available)})")
+        for provider in providers[1:]:
+            if provider not in available:
+                print(f"warning : {provider} is not available, running without it")
+        providers = [p for p in providers if p in available]
+        self.session = ort.InferenceSession(model_path, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        self.dynamic = not isinstance(height, int) or not isinstance(width, int)
+        self.imgsz = (imgsz, imgsz) if self.dynamic else (height, width)
+        self.fixed_batch = batch if isinstance(batch, int) else None
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.stride = int(metadata.get("stride", 32))
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        self.iou = iou
+        self.max_det = max_det
+        self.max_nms = max_nms
+        self.model_path = model_path
+
+    def preprocess(self, imgs, imgsz=None):
+        auto = self.dynamic and len({img.shape for img in imgs}) == 1
+        # a fixed-size export can only run at its own input size
+        new_shape = (imgsz, imgsz) if imgsz and self.dynamic else self.imgsz
+        batch, meta = [], []
+        for img in imgs:
+            padded, gain, pad = letterbox(img, new_shape, auto=auto, stride=self.stride)
+            batch.append(padded[..., ::-1].transpose(2, 0, 1))  # BGR HWC -> RGB CHW
+            meta.append((img.shape[:2], gain, pad))
+        batch = np.ascontiguousarray(np.stack(batch)).astype(np.float32) / 255.0
+        return batch, meta
+
+    def postprocess(self, pred, conf, shape, gain, pad):
+        pred = pred.T  # (4 + nc, anchors) -> (anchors, 4 + nc)
+        scores_all = pred[:, 4:]
+        cls = scores_all.argmax(1)
+        scores = scores_all[np.arange(len(cls)), cls]
+        keep = scores > conf
+        pred, scores, cls = pred[keep], scores[keep], cls[keep]
+        if len(scores) > self.max_nms:
+            top = scores.argsort()[::-1][:self.max_nms]
+            pred, scores, cls = pred[top], scores[top], cls[top]
+        xy, wh = pred[:, :2], pred[:, 2:4]
+        xyxy = np.concatenate([xy - wh / 2, xy + wh / 2], axis=1)
+        if len(scores):
+            # offset boxes by class so NMS never suppresses across classes
+            i = nms(xyxy + cls[:, None] * 7680.0, scores, self.iou)[:self.max_det]
+            xyxy, scores, cls = xyxy[i], scores[i], cls[i]
+        # letterbox coordinates -> original image pixels
+        xyxy = xyxy.copy()
+        xyxy[:, [0, 2]] -= pad[0]
+        xyxy[:, [1, 3]] -= pad[1]
+        xyxy /= gain
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, shape[0])
+        return NumpyResult(NumpyBoxes(xyxy, scores, cls.astype(np.float32)), self.names)
+
+    def __call__(self, imgs, conf=0.25, imgsz=None, verbose=False, **kwargs):
+        if not isinstance(imgs, list):
+            imgs = [imgs]
+        batch, meta = self.preprocess(imgs, imgsz)
+        if self.fixed_batch is None:
+            preds = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            preds = np.concatenate([self.session.run(None, {self.input_name: batch[i:i + self.fixed_batch]})[0]
+                                    for i in range(0, len(batch), self.fixed_batch)])
+        return [self.postprocess(pred, conf, *m) for pred, m in zip(preds, meta)]
@@ -0,0 +1,250 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from auto_label_ver_4byfrank import program
+from labeledit import bbox_presets, label_preset_image
+import label_io
+from scanner import scan_files
+
+
+def count_images(input_path):
+    return sum(1 for entry in scan_files(input_path, recursive=False, sort=False))
+
+
+def time_run(loader, input_path, batch_size=1, workers=1, output_path=None):
+    """Run program.run once, return seconds.
+
+    Without output_path the run goes to a scratch folder that is removed
+    afterwards; with it the output is kept for inspection.
+    """
+    keep_output = output_path is not None
+    output_path = output_path or tempfile.mkdtemp(prefix="autolabel_bench_")
+    try:
+        auto_label = program()
+        auto_label.model = loader.model
+        auto_label.model_path = loader.model_path
+        auto_label.set_backend(loader.backend)
+        auto_label.set_resolution(loader.decode_scale, loader.imgsz)
+        auto_label.set_class()
+        auto_label.set_input_path(input_path)
+        auto_label.set_output_path(output_path)
+        auto_label.create_output_folder(output_path)
+        auto_label.create_report_folder(output_path)
+        auto_label.set_batch_size(batch_size)
+        auto_label.set_workers(workers)
+        start = time.perf_counter()
+        auto_label.run()
+        return time.perf_counter() - start
+    finally:
+        if not keep_output:
+            shutil.rmtree(output_path, ignore_errors=True)
+
+
+def bench_batch_sizes(model_path, input_path, batch_sizes=(1, 8, 32)):
+    loader = program()
+    loader.set_model(model_path)
+    total = count_images(input_path)
+    # first call pays the warm-up cost, keep it out of the numbers
+    time_run(loader, input_path, batch_sizes[0])
+
+    results = {}
+    for batch_size in batch_sizes:
+        elapsed = time_run(loader, input_path, batch_size)
+        results[batch_size] = total / elapsed if elapsed > 0 else 0.0
+
+    print("=" * 40)
+    print(f"{'batch':>8} {'images/sec':>14} {'speedup':>10}")
+    base = results[batch_sizes[0]] or 1.0
+    for batch_size, rate in results.items():
+        print(f"{batch_size:>8} {rate:>14.2f} {rate / base:>9.2f}x")
+    print("=" * 40)
+    return results
+
+
+def bench_workers(model_path, input_path, max_workers, batch_size=1):
+    """Scaling efficiency of the sharded mode for 1..max_workers processes."""
+    loader = program()
+    loader.set_model(model_path)
+    total = count_images(input_path)
+    time_run(loader, input_path, batch_size)
+
+    results = {}
+    for workers in range(1, max_workers + 1):
+        elapsed = time_run(loader, input_path, batch_size, workers)
+        results[workers] = total / elapsed if elapsed > 0 else 0.0
+
+    print("=" * 50)
+    print(f"{'workers':>8} {'images/sec':>14} {'speedup':>10} {'efficiency':>12}")
+    base = results[1] or 1.0
+    for workers, rate in results.items():
+        speedup = rate / base
+        print(f"{workers:>8} {rate:>14.2f} {speedup:>9.2f}x {speedup / workers * 100:>11.1f}%")
+    print("=" * 50)
+    return results
+
+
+def read_labels(label_folder):
+    labels = {}
+    for name in sorted(os.listdir(label_folder)):
+        with open(os.path.join(label_folder, name)) as file:
+            labels[name] = sorted(tuple(float(v) for v in line.split()) for line in file if line.strip())
+    return labels
+
+
+def compare_labels(reference_folder, other_folder, tol=1e-3):
+    """Differences between two runs: missing/extra label files, class changes, coordinates off by more than tol."""
+    reference = read_labels(reference_folder)
+    other = read_labels(other_folder)
+    problems = [f"missing {name}" for name in reference if name not in other]
+    problems += [f"extra {name}" for name in other if name not in reference]
+    for name in reference.keys() & other.keys():
+        ref_rows, rows = reference[name], other[name]
+        if len(ref_rows) != len(rows):
+            problems.append(f"{name}: {len(ref_rows)} boxes vs {len(rows)}")
+            continue
+        for ref_row, row in zip(ref_rows, rows):
+            if ref_row[0] != row[0]:
+                problems.append(f"{name}: class {int(ref_row[0])} vs {int(row[0])}")
+            elif max(abs(a - b) for a, b in zip(ref_row[1:], row[1:])) > tol:
+                problems.append(f"{name}: box {ref_row[1:]} vs {row[1:]}")
+    return problems
+
+
+def bench_backends(model_paths, input_path, batch_size=1, tol=1e-3):
+    """images/sec per backend plus label parity against the first one.
+
+    model_paths maps a backend name to its weight file, e.g.
+    {"torch": "best.pt", "onnx": "best.onnx"}. Returns the rates and the
+    backends whose labels differ from the first one.
+    """
+    total = count_images(input_path)
+    scratch = tempfile.mkdtemp(prefix="autolabel_bench_")
+    results = {}
+    try:
+        for backend, model_path in model_paths.items():
+            loader = program()
+            loader.set_backend(backend)
+            loader.set_model(model_path)
+            output_path = os.path.join(scratch, backend)
+            elapsed = time_run(loader, input_path, batch_size, output_path=output_path)
+            results[backend] = total / elapsed if elapsed > 0 else 0.0
+
+        print("=" * 50)
+        print(f"{'backend':>10} {'images/sec':>14} {'speedup':>10} {'parity':>12}")
+        reference = next(iter(model_paths))
+        reference_labels = os.path.join(scratch, reference, "output", "labels")
+        base = results[reference] or 1.0
+        mismatched = []
+        for backend, rate in results.items():
+            problems = compare_labels(reference_labels, os.path.join(scratch, backend, "output", "labels"), tol)
+            parity = "ok" if not problems else f"{len(problems)} diffs"
+            if problems:
+                mismatched.append(backend)
+            print(f"{backend:>10} {rate:>14.2f} {rate / base:>9.2f}x {parity:>12}")
+            for problem in problems[:10]:
+                print(f"    {problem}")
+        print("=" * 50)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results, mismatched
+
+
+def bench_decode_scales(model_path, input_path, decode_scales=(1, 2, 4), imgsz=None, batch_size=1, tol=0.01):
+    """images/sec per decode scale plus label parity against full-resolution decode."""
+    loader = program()
+    loader.set_model(model_path)
+    total = count_images(input_path)
+    scratch = tempfile.mkdtemp(prefix="autolabel_bench_")
+    results = {}
+    try:
+        time_run(loader, input_path, batch_size)
+        for decode_scale in decode_scales:
+            loader.set_resolution(decode_scale, imgsz if decode_scale > 1 else None)
+            output_path = os.path.join(scratch, str(decode_scale))
+            elapsed = time_run(loader, input_path, batch_size, output_path=output_path)
+            results[decode_scale] = total / elapsed if elapsed > 0 else 0.0
+
+        print("=" * 50)
+        print(f"{'scale':>8} {'images/sec':>14} {'speedup':>10} {'parity':>14}")
+        reference_labels = os.path.join(scratch, str(decode_scales[0]), "output", "labels")
+        base = results[decode_scales[0]] or 1.0
+        for decode_scale, rate in results.items():
+            problems = compare_labels(reference_labels, os.path.join(scratch, str(decode_scale), "output", "labels"), tol)
+            parity = "ok" if not problems else f"{len(problems)} diffs"
+            print(f"{'1/' + str(decode_scale):>8} {rate:>14.2f} {rate / base:>9.2f}x {parity:>14}")
+            for problem in problems[:10]:
+                print(f"    {problem}")
+        print("=" * 50)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def bench_label_io(label_dir):
+    """Cold parse, mtime-checked reopen and folder-checked reopen of a label folder."""
+    shutil.rmtree(label_io.default_cache_path(label_dir), ignore_errors=True)
+    timings = {}
+    for name, check in (("cold parse", "files"), ("reopen, file mtimes", "files"), ("reopen, folder mtimes", "dirs")):
+        start = time.perf_counter()
+        labels = label_io.read_labels(label_dir, check=check)
+        timings[name] = time.perf_counter() - start
+    print(f"label io : {len(labels)} boxes in {len(labels.files)} files")
+    for name, elapsed in timings.items():
+        print(f"{name:>24} {elapsed * 1000:>10.1f} ms")
+    return timings
+
+
+def bench_preset_labeler(input_path, bbox_size="6 inch"):
+    """images/sec of the single-pass preset labeler used by labeledit.py."""
+    image_files = [entry.name for entry in scan_files(input_path, recursive=False)]
+    output_path = tempfile.mkdtemp(prefix="autolabel_bench_")
+    try:
+        label_folder = os.path.join(output_path, "labels")
+        file_label_folder = os.path.join(output_path, "image_label")
+        os.makedirs(label_folder)
+        os.makedirs(file_label_folder)
+        start = time.perf_counter()
+        for filename in image_files:
+            label_preset_image(input_path, filename, bbox_presets[bbox_size],
+                               label_folder, file_label_folder)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_path, ignore_errors=True)
+
+    rate = len(image_files) / elapsed if elapsed > 0 else 0.0
+    print(f"preset labeler : {len(image_files)} images in {elapsed:.2f}s ({rate:.2f} images/sec)")
+    return rate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auto labeling throughput benchmark")
+    parser.add_argument("--model", help="YOLO weight file, omit to only time the preset labeler")
+    parser.add_argument("--input", required=True, help="folder of input images")
+    parser.add_argument("--onnx-model", help="ONNX export of --model, compares speed and labels across backends")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--decode-scales", type=int, nargs="+",
+                        help="also compare reduced-resolution decode, e.g. 1 2 4")
+    parser.add_argument("--imgsz", type=int, help="model input size for the reduced decode runs")
+    parser.add_argument("--labels", help="also time bulk reading of this label folder")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="also report scaling efficiency for 1..N worker processes")
+    args = parser.parse_args()
+    status = 0
+    if args.model:
+        bench_batch_sizes(args.model, args.input, tuple(args.batch_sizes))
+        if args.workers > 0:
+            bench_workers(args.model, args.input, args.workers)
+        if args.decode_scales:
+            bench_decode_scales(args.model, args.input, tuple(args.decode_scales), args.imgsz)
+        if args.onnx_model:
+            results, mismatched = bench_backends({"torch": args.model, "onnx": args.onnx_model}, args.input)
+            for backend in mismatched:
+                print(f"parity : {backend} labels differ from torch")
+            status = 1 if mismatched else 0
+    bench_preset_labeler(args.input)
+    if args.labels:
+        bench_label_io(args.labels)
+    raise SystemExit(status)
@@ -0,0 +1,144 @@
+import colorsys
+import json
+import os
+import re
+
+# optional, read at startup by program, labeledit.py, Label_with_xywh.py and preset_stats.py
+CLASS_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "classes.json")
+
+# class id order, colors are BGR; a class without patterns matches file names starting with "<name>_"
+DEFAULT_CLASSES = [
+    {"name": "canister", "color": [0, 255, 255]},
+    {"name": "foam", "color": [255, 0, 255]},
+    {"name": "ring", "color": [0, 255, 0]},
+    {"name": "tyvek", "color": [0, 0, 255]},
+    {"name": "wafer", "color": [255, 0, 0]},
+]
+
+# file names remembered per registry, the cache is dropped when it gets this big
+MATCH_CACHE_SIZE = 1 << 16
+
+# patterns made of these characters only are plain names, they go into the trie
+LITERAL_PATTERN = re.compile(r"[\w\- ]+")
+# "^" and a plain name, a prefix of the base name; these go into a second, anchored trie
+PREFIX_PATTERN = re.compile(r"\^([\w\- ]+)")
+
+
+def trie_pattern(words):
+    """Regex matching any of words, factored into a trie so every position costs one branch per character.
+
+    Optional tails are greedy, so the longest word wins at a position.
+    """
+    root = {}
+    for word in words:
+        node = root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node):
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(root)
+
+
+def default_color(index):
+    """Distinct BGR color for a class without one, golden ratio steps around the hue circle."""
+    r, g, b = colorsys.hsv_to_rgb((index * 0.618033988749895) % 1.0, 0.9, 1.0)
+    return int(b * 255), int(g * 255), int(r * 255)
+
+
+class ClassRegistry:
+    """Class names, overlay colors and file name patterns, in class id order.
+
+    A pattern is a case-insensitive regex searched in the base name of a
+    file. The default is "^<name>_", the base name has to start with the
+    class name and "_", so "spring_foam.jpg" is no class rather than ring; a
+    plain pattern from the config, e.g. "ring", matches anywhere in the name.
+    Prefixes ("^" and a plain name) and plain names (letters, digits, "_",
+    "-" and spaces) are compiled into two tries, the other patterns are
+    appended as alternatives, so a file name is scanned once however many
+    classes there are. The leftmost match wins, a prefix first; at the same
+    position the longest plain name wins, then the other patterns in class
+    order. A name nothing matches gives None, it is never defaulted to
+    class 0. Patterns must not use named groups.
+    """
+
+    def __init__(self, classes=DEFAULT_CLASSES):
+        self.names = []
+        self.colors = []
+        self.patterns = []
+        for index, cls in enumerate(classes):
+            if isinstance(cls, str):
+                cls = {"name": cls}
+            name = cls["name"]
+            self.names.append(name)
+            self.colors.append(tuple(cls.get("color") or default_color(index)))
+            self.patterns.append(list(cls.get("patterns") or [f"^{re.escape(name)}_"]))
+        # lowercase plain name or prefix -> class id, the first class listing one keeps it
+        self.prefixes = {}
+        self.literals = {}
+        alternatives = []
+        for index, patterns in enumerate(self.patterns):
+            for pattern in patterns:
+                prefix = PREFIX_PATTERN.fullmatch(pattern)
+                if prefix:
+                    self.prefixes.setdefault(prefix.group(1).lower(), index)
+                elif LITERAL_PATTERN.fullmatch(pattern):
+                    self.literals.setdefault(pattern.lower(), index)
+                else:
+                    alternatives.append((f"c{len(alternatives)}", pattern, index))
+        # group name -> class id, the group that matched is m.lastgroup
+        self.group_class = {group: index for group, pattern, index in alternatives}
+        parts = [f"(?P<{group}>{pattern})" for group, pattern, index in alternatives]
+        if self.literals:
+            parts.insert(0, f"(?P<literal>{trie_pattern(self.literals)})")
+        if self.prefixes:
+            parts.insert(0, f"(?P<prefix>^{trie_pattern(self.prefixes)})")
+        self.regex = re.compile("|".join(parts), re.IGNORECASE) if parts else None
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def match(self, file_name):
+        """Class id of a file name, None when no class matches."""
+        try:
+            return self.cache[file_name]
+        except KeyError:
+            pass
+        m = self.regex.search(os.path.basename(file_name)) if self.regex is not None else None
+        if m is None:
+            class_id = None
+        elif m.lastgroup == "prefix":
+            class_id = self.prefixes[m.group().lower()]
+        elif m.lastgroup == "literal":
+            class_id = self.literals[m.group().lower()]
+        else:
+            class_id = self.group_class[m.lastgroup]
+        if len(self.cache) >= MATCH_CACHE_SIZE:
+            self.cache.clear()
+        self.cache[file_name] = class_id
+        return class_id
+
+    def params(self):
+        """Names and patterns, the part of the registry that decides the labels (for run manifests)."""
+        return [[name, patterns] for name, patterns in zip(self.names, self.patterns)]
+
+
+def load_class_registry(path=None):
+    """Registry from a config file, {"classes": [{"name", "color", "patterns"}, ...]}.
+
+    path None reads classes.json next to the scripts when there is one and
+    falls back to DEFAULT_CLASSES; an explicit path has to exist.
+    """
+    if path is None:
+        if not os.path.exists(CLASS_CONFIG):
+            return ClassRegistry()
+        path = CLASS_CONFIG
+    with open(path, "r") as f:
+        return ClassRegistry(json.load(f)["classes"])
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from manifest import file_hash
+
+try:
+    # optional, several times faster than blake2b on large photos
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def fast_hash(file_path, chunk_size=1 << 20):
+    """xxh3-128 of the file bytes when xxhash is installed, blake2b (file_hash) otherwise."""
+    if xxhash is None:
+        return file_hash(file_path, chunk_size)
+    digest = xxhash.xxh3_128()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def perceptual_hash(file_path):
+    """64-bit difference hash of the picture, equal for re-encoded or resized copies; None when unreadable."""
+    # a 1/8 decode is plenty for a 9x8 thumbnail and skips most of the JPEG work
+    img = cv2.imread(file_path, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+
+class HashCache:
+    """Hashes remembered by path, size and mtime in a JSON lines file.
+
+    An unchanged file is never re-read once its hash is known; the file is
+    append-only, the last line for a path wins. New lines go through one
+    handle that stays open, flushed every `flush_every` lines or
+    `flush_interval` seconds and when the cache is closed.
+    """
+
+    def __init__(self, index_path, hash_fn=file_hash, flush_every=256, flush_interval=5.0):
+        self.index_path = index_path
+        self.hash_fn = hash_fn
+        self.hashes = {}
+        self.lock = threading.Lock()
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.file = None
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        if os.path.exists(index_path):
+            self.load()
+
+    def load(self):
+        with open(self.index_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # torn last line after a crash
+                    continue
+                self.hashes[(entry["path"], entry["size"], entry["mtime"])] = entry["hash"]
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        key = (path, st.st_size, st.st_mtime_ns)
+        with self.lock:
+            if key in self.hashes:
+                return self.hashes[key]
+        digest = self.hash_fn(path)
+        line = json.dumps({"path": path, "size": st.st_size, "mtime": st.st_mtime_ns, "hash": digest}) + "\n"
+        with self.lock:
+            self.hashes[key] = digest
+            if self.file is None:
+                self.file = open(self.index_path, "a")
+            self.file.write(line)
+            self.pending += 1
+            if self.pending >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush_locked()
+        return digest
+
+    def flush_locked(self):
+        if self.file is not None:
+            self.file.flush()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            self.pending = 0
+
+
+def hash_files(folder, names, cache, workers=4):
+    """{name: hash} of the files of a folder, read on a thread pool."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(names, pool.map(lambda name: cache.get(os.path.join(folder, name)), names)))
+
+
+def group_duplicates(names, hashes):
+    """{first name: [other names with the same hash]}, only groups of two or more.
+
+    Names are sorted first, so the same folder always picks the same file to
+    run inference on. Files without a hash (unreadable) are never grouped.
+    """
+    groups = {}
+    for name in sorted(names):
+        digest = hashes.get(name)
+        if digest is not None:
+            groups.setdefault(digest, []).append(name)
+    return {group[0]: group[1:] for group in groups.values() if len(group) > 1}
@@ -0,0 +1,95 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+# format name -> file extension of the encoded overlay images
+ENCODE_FORMATS = {"jpg": ".jpg", "webp": ".webp", "png": ".png"}
+
+# all : every image, every : every Nth image, flagged : images with a report entry, off : never
+OVERLAY_MODES = ("all", "every", "flagged", "off")
+
+
+def encode_params(ext, quality=None, png_compression=None):
+    """cv2.imwrite params for a file extension.
+
+    Settings left at None are not passed, so the output is byte-identical
+    to a plain cv2.imwrite. quality (1-100) applies to jpg and webp,
+    png_compression (0-9) to png.
+    """
+    ext = ext.lower()
+    if quality is not None and ext in (".jpg", ".jpeg"):
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if quality is not None and ext == ".webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    if png_compression is not None and ext == ".png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+    return []
+
+
+def wants_overlay(mode, index, every=1, flagged=False):
+    """True when the index-th image (counted from 0) gets an overlay image under mode."""
+    if mode == "all":
+        return True
+    if mode == "every":
+        return index % max(1, every) == 0
+    if mode == "flagged":
+        return flagged
+    if mode == "off":
+        return False
+    raise ValueError(f"unknown overlay mode: {mode}")
+
+
+class ImageEncoder:
+    """cv2.imwrite with fixed settings, on a dedicated thread pool.
+
+    fmt picks the output format (a key of ENCODE_FORMATS), None keeps the
+    extension of the path it is given. With workers=0 images are encoded
+    inline. At most max_pending encodes are queued, each holds a frame.
+    """
+
+    def __init__(self, fmt=None, quality=None, png_compression=None, workers=2, timer=None, max_pending=32):
+        if fmt is not None and fmt not in ENCODE_FORMATS:
+            raise ValueError(f"unknown encode format: {fmt}")
+        self.fmt = fmt
+        self.quality = quality
+        self.png_compression = png_compression
+        self.timer = timer
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
+        self.pending = deque()
+
+    def output_path(self, path):
+        if self.fmt is None:
+            return path
+        return os.path.splitext(path)[0] + ENCODE_FORMATS[self.fmt]
+
+    def encode(self, path, img):
+        params = encode_params(os.path.splitext(path)[1], self.quality, self.png_compression)
+        if self.timer is None:
+            return cv2.imwrite(path, img, params)
+        with self.timer.stage("imwrite"):
+            return cv2.imwrite(path, img, params)
+
+    def submit(self, path, img):
+        """Encode img to output_path(path), return the future (None when encoded inline)."""
+        path = self.output_path(path)
+        if self.pool is None:
+            self.encode(path, img)
+            return None
+        future = self.pool.submit(self.encode, path, img)
+        self.pending.append(future)
+        while len(self.pending) > self.max_pending:
+            self.pending.popleft().result()
+        while self.pending and self.pending[0].done():
+            self.pending.popleft().result()
+        return future
+
+    def close(self):
+        """Wait for every queued encode and stop the pool, the first error is raised here."""
+        if self.pool is None:
+            return
+        self.pool.shutdown(wait=True)
+        while self.pending:
+            self.pending.popleft().result()
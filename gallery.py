@@ -0,0 +1,264 @@
+import os
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from PIL import Image, ImageTk
+
+from dedup import HashCache
+from encoding import ENCODE_FORMATS
+from image_size import read_reduced
+from manifest import Manifest
+from scanner import IMAGE_EXTENSIONS, scan_files
+
+# thumbnails are keyed by content, the same photo in another folder reuses its thumbnail
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "autolabel", "thumbnails")
+
+
+def list_images(folder):
+    """Sorted image names below a folder, "sub/name.jpg" for images of a --recursive run.
+
+    The name without its extension is the stem the report files list.
+    """
+    return [entry.name for entry in scan_files(folder)]
+
+
+def list_run_images(manifest_path, categories):
+    """Every image a labeling run recorded, whichever folder it was routed to.
+
+    The names come from the run manifest; stems in the reports (categories
+    from load_report_categories) that the manifest does not list, e.g. of a
+    run from before manifests, are added without an extension.
+    """
+    names = sorted(Manifest(manifest_path).entries) if manifest_path and os.path.exists(manifest_path) else []
+    known = {os.path.splitext(name)[0] for name in names}
+    stems = set().union(*categories.values()) - known
+    return names + sorted(stems)
+
+
+def load_report_categories(report_path):
+    """{report name: set of file stems} from the report/*.txt files of a run."""
+    categories = {}
+    if not report_path or not os.path.isdir(report_path):
+        return categories
+    for name in sorted(os.listdir(report_path)):
+        if not name.endswith(".txt"):
+            continue
+        with open(os.path.join(report_path, name), "r") as f:
+            stems = {line.strip() for line in f if line.strip()}
+        if stems:
+            categories[os.path.splitext(name)[0]] = stems
+    return categories
+
+
+class ThumbnailCache:
+    """Thumbnails on disk keyed by content hash, each full-size file is decoded at most once.
+
+    Content hashes are remembered by path, size and mtime in hashes.jsonl,
+    so an unchanged file is not even re-read after the first build.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, size=(160, 120)):
+        self.size = size
+        self.folder = os.path.join(cache_dir, f"{size[0]}x{size[1]}")
+        os.makedirs(self.folder, exist_ok=True)
+        self.hashes = HashCache(os.path.join(cache_dir, "hashes.jsonl"))
+
+    def close(self):
+        self.hashes.close()
+
+    def content_hash(self, path):
+        return self.hashes.get(path)
+
+    def cached(self, path):
+        """Thumbnail path if it is already built, None otherwise."""
+        thumb_path = os.path.join(self.folder, self.content_hash(path) + ".jpg")
+        return thumb_path if os.path.exists(thumb_path) else None
+
+    def get(self, path):
+        """Thumbnail path of an image, building it on a miss; None when the image can't be read."""
+        thumb_path = os.path.join(self.folder, self.content_hash(path) + ".jpg")
+        if os.path.exists(thumb_path):
+            return thumb_path
+        # a JPEG is decoded at the smallest DCT scale that still covers the thumbnail
+        img = read_reduced(path, self.size)
+        if img is None:
+            return None
+        h, w = img.shape[:2]
+        scale = min(self.size[0] / w, self.size[1] / h, 1.0)
+        if scale < 1.0:
+            img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        # write then rename, a reader never sees a half written thumbnail
+        tmp_path = f"{thumb_path}.{threading.get_ident()}.tmp.jpg"
+        cv2.imwrite(tmp_path, img)
+        os.replace(tmp_path, thumb_path)
+        return thumb_path
+
+
+class GalleryWindow:
+    """Paged thumbnail review of a labeling run.
+
+    Only the visible page is loaded; thumbnails are built by a background
+    pool (current page first, then the next one) and handed to Tk through
+    a queue polled with after(), so paging through tens of thousands of
+    images never blocks the window. Names are the run manifest entries when
+    manifest_path is given, otherwise every image in image_folders; each is
+    shown from the first of image_folders that holds it, or from
+    overlay_folder when an overlay exists.
+    """
+
+    COLUMNS = 6
+    ROWS = 4
+
+    def __init__(self, parent, image_folders, report_path=None, overlay_folder=None, manifest_path=None,
+                 cache_dir=DEFAULT_CACHE_DIR, thumb_size=(160, 120), workers=2):
+        self.image_folders = [folder for folder in image_folders if os.path.isdir(folder)]
+        self.overlay_folder = overlay_folder
+        self.cache = ThumbnailCache(cache_dir, thumb_size)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.ready = queue.Queue()
+        self.categories = load_report_categories(report_path)
+        if manifest_path:
+            self.names = list_run_images(manifest_path, self.categories)
+        else:
+            self.names = sorted({name for folder in self.image_folders for name in list_images(folder)})
+        self.filtered = self.names
+        self.page = 0
+        self.generation = 0
+        self.photos = {}
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("Review")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.category = tk.StringVar(value="all")
+        self.page_var = tk.StringVar()
+        self.setup_ui()
+        self.show_page()
+        self.poll()
+
+    @property
+    def page_size(self):
+        return self.COLUMNS * self.ROWS
+
+    def setup_ui(self):
+        bar = tk.Frame(self.window)
+        bar.pack(fill='x', padx=5, pady=5)
+        tk.Label(bar, text="Category:").pack(side='left')
+        tk.OptionMenu(bar, self.category, "all", *self.categories, command=self.select_category).pack(side='left')
+        tk.Button(bar, text="<", width=3, command=lambda: self.go(-1)).pack(side='left', padx=(20, 0))
+        tk.Label(bar, textvariable=self.page_var, width=24).pack(side='left')
+        tk.Button(bar, text=">", width=3, command=lambda: self.go(1)).pack(side='left')
+
+        grid = tk.Frame(self.window)
+        grid.pack(padx=5, pady=5)
+        w, h = self.cache.size
+        self.cells = []
+        for i in range(self.page_size):
+            # fixed cell size, the window does not jump around while thumbnails arrive
+            cell = tk.Frame(grid, width=w + 10, height=h + 30)
+            cell.grid_propagate(False)
+            cell.pack_propagate(False)
+            cell.grid(row=i // self.COLUMNS, column=i % self.COLUMNS, padx=2, pady=2)
+            label = tk.Label(cell, compound='top', font=('Arial', 8))
+            label.pack(fill='both', expand=True)
+            self.cells.append(label)
+
+        self.window.bind("<Left>", lambda e: self.go(-1))
+        self.window.bind("<Right>", lambda e: self.go(1))
+        self.window.bind("<MouseWheel>", lambda e: self.go(-1 if e.delta > 0 else 1))
+        self.window.bind("<Button-4>", lambda e: self.go(-1))
+        self.window.bind("<Button-5>", lambda e: self.go(1))
+
+    def select_category(self, category):
+        if category == "all":
+            self.filtered = self.names
+        else:
+            stems = self.categories[category]
+            # a name is a stem itself when it came from a report
+            self.filtered = [name for name in self.names if os.path.splitext(name)[0] in stems or name in stems]
+        self.page = 0
+        self.show_page()
+
+    def page_count(self):
+        return max(1, -(-len(self.filtered) // self.page_size))
+
+    def go(self, step):
+        page = min(max(self.page + step, 0), self.page_count() - 1)
+        if page != self.page:
+            self.page = page
+            self.show_page()
+
+    def page_names(self, page):
+        start = page * self.page_size
+        return self.filtered[start:start + self.page_size]
+
+    def source_path(self, name):
+        if self.overlay_folder:
+            for ext in ENCODE_FORMATS.values():
+                overlay = os.path.join(self.overlay_folder, os.path.splitext(name)[0] + ext)
+                if os.path.exists(overlay):
+                    return overlay
+        # a report stem is tried with every image extension
+        has_ext = os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+        candidates = [name] if has_ext else [name + ext for ext in IMAGE_EXTENSIONS]
+        for folder in self.image_folders:
+            for candidate in candidates:
+                path = os.path.join(folder, candidate)
+                if os.path.exists(path):
+                    return path
+        return None
+
+    def show_page(self):
+        # a new generation makes queued work of the previous page a no-op
+        self.generation += 1
+        generation = self.generation
+        self.page_var.set(f"page {self.page + 1}/{self.page_count()} ({len(self.filtered)} images)")
+        self.photos = {}
+        names = self.page_names(self.page)
+        for slot, label in enumerate(self.cells):
+            label.config(image='', text=names[slot] if slot < len(names) else "")
+        for slot, name in enumerate(names):
+            self.pool.submit(self.load_thumbnail, generation, slot, name)
+        for name in self.page_names(self.page + 1):
+            self.pool.submit(self.load_thumbnail, generation, None, name)
+
+    def load_thumbnail(self, generation, slot, name):
+        # runs on the pool, Tk objects are only created in poll()
+        if generation != self.generation:
+            return
+        try:
+            path = self.source_path(name)
+            thumb_path = self.cache.get(path) if path is not None else None
+        except OSError:
+            thumb_path = None
+        if slot is not None:
+            self.ready.put((generation, slot, name, thumb_path))
+
+    def poll(self):
+        try:
+            while True:
+                generation, slot, name, thumb_path = self.ready.get_nowait()
+                if generation != self.generation:
+                    continue
+                if thumb_path is None:
+                    self.cells[slot].config(text=f"{name}\n(unreadable)")
+                    continue
+                photo = ImageTk.PhotoImage(Image.open(thumb_path))
+                self.photos[slot] = photo
+                self.cells[slot].config(image=photo, text=name)
+        except queue.Empty:
+            pass
+        if self.window.winfo_exists():
+            self.window.after(50, self.poll)
+
+    def close(self):
+        self.generation += 1
+        self.window.destroy()
+        # thumbnails in flight still use the cache, it is closed once they are done
+        threading.Thread(target=self.shutdown).start()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.cache.close()
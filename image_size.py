@@ -0,0 +1,85 @@
+import os
+import struct
+
+import cv2
+
+from dedup import HashCache
+
+# SOF markers carry the frame size, C4 (DHT), C8 (JPG) and CC (DAC) share the range but don't
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# cv2 decodes JPEGs at 1/2, 1/4 or 1/8 straight from the DCT coefficients
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def probe_size(path):
+    """(width, height) from the file header, without decoding any pixels; None when unknown or broken.
+
+    Reads the JPEG SOF segment, the PNG IHDR chunk or the BMP info header,
+    a few hundred bytes at most for a typical camera JPEG.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(26)
+            if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+                return struct.unpack(">II", head[16:24])
+            if head[:2] == b"BM" and len(head) == 26:
+                width, height = struct.unpack("<ii", head[18:26])
+                return width, abs(height)
+            if head[:2] == b"\xff\xd8":
+                return jpeg_size(f)
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def jpeg_size(f):
+    # walk the segments from the start of the file until the frame header
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] == 0xFF:
+            # fill byte before a marker
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            # markers without a length
+            continue
+        if marker[1] == 0xD9 or marker[1] == 0xDA:
+            # end of image or start of scan before any frame header
+            return None
+        length = struct.unpack(">H", f.read(2))[0]
+        if marker[1] in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+class SizeCache(HashCache):
+    """Header sizes of the images of a folder, remembered by path, size and mtime.
+
+    The index is a sizes.jsonl in cache_dir in the HashCache format, with the
+    size as the hash; an unchanged file is not even opened again on the next
+    run. get returns (width, height) or None.
+    """
+
+    def __init__(self, cache_dir):
+        super().__init__(os.path.join(cache_dir, "sizes.jsonl"), probe_size)
+
+
+def read_reduced(path, min_size, size=None):
+    """cv2.imread at the smallest 1/2, 1/4 or 1/8 scale still covering min_size (width, height).
+
+    size is the (width, height) from the header, probed here when not given.
+    The scale is picked for either orientation, so EXIF rotation never
+    leaves the image smaller than min_size. Falls back to a full decode.
+    """
+    size = size or probe_size(path)
+    if size is not None:
+        short_side = min(size)
+        for factor, flag in REDUCED_FLAGS:
+            if short_side // factor >= max(min_size):
+                return cv2.imread(path, flag)
+    return cv2.imread(path)
@@ -0,0 +1,218 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# one row per box, rows of a file are contiguous and files are in sorted order
+LABEL_DTYPE = np.dtype([
+    ("file", "<i4"),
+    ("cls", "<i2"),
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("w", "<f8"),
+    ("h", "<f8"),
+    ("conf", "<f8"),  # NaN when the label file has no confidence column
+])
+
+CACHE_VERSION = 1
+
+
+def scan_labels(label_dir):
+    """Sorted (relative path, mtime_ns) of every .txt below label_dir, plus {relative dir: mtime_ns}."""
+    files, dirs = [], {}
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        path = os.path.join(label_dir, rel_dir)
+        dirs[rel_dir] = os.stat(path).st_mtime_ns
+        with os.scandir(path) as entries:
+            for entry in entries:
+                rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                if entry.is_dir():
+                    stack.append(rel)
+                elif entry.name.endswith(".txt"):
+                    files.append((rel, entry.stat().st_mtime_ns))
+    files.sort()
+    return files, dirs
+
+
+def parse_label_file(path):
+    """(n, 6) float array of class, x, y, w, h, conf; conf is NaN for 5-column lines."""
+    with open(path, "r") as f:
+        text = f.read()
+    values = text.split()
+    if not values:
+        return np.empty((0, 6))
+    lines = text.splitlines()
+    columns = len(lines[0].split())
+    if columns in (5, 6) and len(values) == columns * sum(1 for line in lines if line.strip()):
+        # the common case, every line has the same number of columns
+        rows = np.array(values, dtype=float).reshape(-1, columns)
+    else:
+        rows = [line.split() for line in lines]
+        rows = [row + ["nan"] if len(row) == 5 else row for row in rows if len(row) in (5, 6)]
+        if not rows:
+            return np.empty((0, 6))
+        rows = np.array(rows, dtype=float)
+    if rows.shape[1] == 5:
+        rows = np.hstack([rows, np.full((len(rows), 1), np.nan)])
+    return rows
+
+
+def parse_label_files(paths):
+    return [parse_label_file(path) for path in paths]
+
+
+def chunks(items, size=1024):
+    # pool tasks of many small files, one task per file costs more than the parsing
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def to_records(file_indices, parsed):
+    counts = [len(rows) for rows in parsed]
+    boxes = np.empty(sum(counts), dtype=LABEL_DTYPE)
+    if len(boxes):
+        rows = np.vstack([rows for rows in parsed if len(rows)])
+        boxes["file"] = np.repeat(file_indices, counts)
+        boxes["cls"] = rows[:, 0]
+        for k, field in enumerate(("x", "y", "w", "h", "conf"), start=1):
+            boxes[field] = rows[:, k]
+    return boxes
+
+
+class LabelSet:
+    """All boxes of a label folder: `files` (relative paths) and `boxes` (LABEL_DTYPE rows)."""
+
+    def __init__(self, files, boxes):
+        self.files = list(files)
+        self.boxes = boxes
+        self.index = {name: i for i, name in enumerate(self.files)}
+        # row range of every file, boxes are sorted by file index
+        self.offsets = np.searchsorted(boxes["file"], np.arange(len(self.files) + 1))
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def boxes_of(self, name):
+        """Rows of one label file, by relative path with or without .txt."""
+        i = self.index.get(name if name.endswith(".txt") else name + ".txt")
+        if i is None:
+            return self.boxes[:0]
+        return self.boxes[self.offsets[i]:self.offsets[i + 1]]
+
+
+def default_cache_path(label_dir):
+    # next to the folder, writing the cache must not change the folder mtime
+    label_dir = os.path.abspath(label_dir)
+    return label_dir + ".cache"
+
+
+def load_cache(cache_path):
+    try:
+        with open(os.path.join(cache_path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta.get("version") != CACHE_VERSION:
+            return None
+        return (meta,
+                np.load(os.path.join(cache_path, "files.npy")),
+                np.load(os.path.join(cache_path, "mtimes.npy")),
+                np.load(os.path.join(cache_path, "boxes.npy"), mmap_mode="r"))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_cache(cache_path, files, mtimes, dirs, boxes):
+    os.makedirs(cache_path, exist_ok=True)
+    arrays = {"files": np.array(files, dtype=str), "mtimes": np.asarray(mtimes, dtype=np.int64), "boxes": boxes}
+    for name, array in arrays.items():
+        # write then rename, a crash never leaves a half written cache behind
+        tmp_path = os.path.join(cache_path, f"{name}.tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, os.path.join(cache_path, f"{name}.npy"))
+    tmp_path = os.path.join(cache_path, "meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": CACHE_VERSION, "dirs": dirs}, f)
+    os.replace(tmp_path, os.path.join(cache_path, "meta.json"))
+
+
+def read_labels(label_dir, cache=True, check="files", cache_path=None, workers=8):
+    """Read every YOLO txt below label_dir into a LabelSet.
+
+    With cache=True the result is kept as .npy files next to the folder and
+    boxes are memory-mapped on the next call. check="files" compares the
+    mtime of every label file and only re-parses the files that changed;
+    check="dirs" only compares folder mtimes, which catches added, removed
+    and renamed files without a stat per file but misses files rewritten in
+    place.
+    """
+    cache_path = cache_path or default_cache_path(label_dir)
+    cached = load_cache(cache_path) if cache else None
+
+    if cached is not None and check == "dirs":
+        meta, files, mtimes, boxes = cached
+        if all(os.path.isdir(os.path.join(label_dir, d)) and os.stat(os.path.join(label_dir, d)).st_mtime_ns == m
+               for d, m in meta["dirs"].items()):
+            return LabelSet(files.tolist(), boxes)
+
+    scanned, dirs = scan_labels(label_dir)
+    files = [rel for rel, _ in scanned]
+    mtimes = [mtime for _, mtime in scanned]
+
+    reuse = np.zeros(0, dtype=LABEL_DTYPE)
+    todo = list(range(len(files)))
+    if cached is not None:
+        meta, old_files, old_mtimes, old_boxes = cached
+        if len(old_files) == len(files) and (old_files == np.array(files, dtype=str)).all() \
+                and (old_mtimes == np.asarray(mtimes, dtype=np.int64)).all():
+            if meta["dirs"] != dirs:
+                # only folder mtimes moved, e.g. a file was added and removed again
+                save_cache(cache_path, files, mtimes, dirs, np.array(old_boxes))
+            return LabelSet(files, old_boxes)
+        # keep the rows of unchanged files, only parse what is new or modified
+        old_index = {(name, int(mtime)): i for i, (name, mtime) in enumerate(zip(old_files.tolist(), old_mtimes.tolist()))}
+        remap = np.full(len(old_files), -1, dtype=np.int64)
+        todo = []
+        for i, key in enumerate(scanned):
+            j = old_index.get(key)
+            if j is None:
+                todo.append(i)
+            else:
+                remap[j] = i
+        keep = remap[old_boxes["file"]] >= 0
+        reuse = np.array(old_boxes[keep])
+        reuse["file"] = remap[reuse["file"]]
+
+    paths = [os.path.join(label_dir, files[i]) for i in todo]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parsed = [rows for chunk in pool.map(parse_label_files, chunks(paths)) for rows in chunk]
+    boxes = np.concatenate([reuse, to_records(np.array(todo, dtype=np.int32), parsed)])
+    boxes = boxes[np.argsort(boxes["file"], kind="stable")]
+
+    if cache:
+        save_cache(cache_path, files, mtimes, dirs, boxes)
+    return LabelSet(files, boxes)
+
+
+def format_rows(rows):
+    lines = []
+    for cls, x, y, w, h, conf in zip(rows["cls"].tolist(), rows["x"].tolist(), rows["y"].tolist(),
+                                     rows["w"].tolist(), rows["h"].tolist(), rows["conf"].tolist()):
+        if conf != conf:  # NaN, no confidence column
+            lines.append(f"{cls} {x} {y} {w} {h}\n")
+        else:
+            lines.append(f"{cls} {x} {y} {w} {h} {conf}\n")
+    return "".join(lines)
+
+
+def write_labels(label_set, label_dir, workers=8):
+    """Write one txt per file of label_set below label_dir, files without boxes become empty files."""
+    def write_files(indices):
+        for i in indices:
+            with open(os.path.join(label_dir, label_set.files[i]), "w") as f:
+                f.write(format_rows(label_set.boxes[label_set.offsets[i]:label_set.offsets[i + 1]]))
+
+    for folder in {os.path.dirname(name) for name in label_set.files}:
+        os.makedirs(os.path.join(label_dir, folder), exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(write_files, chunks(range(len(label_set.files)))))
@@ -6,16 +6,159 @@ from PIL import Image, ImageTk
 import cv2
 import threading
 import time
+from collections import deque
+from itertools import islice
 from tqdm import tqdm
+from manifest import Manifest
+from gallery import ThumbnailCache
+from scanner import scan_chunks, scan_files
+from preset_stats import load_preset_config
+from transfer import TRANSFER_MODES, transfer_file
+from stage_timer import StageTimer
+from encoding import ENCODE_FORMATS, ImageEncoder, wants_overlay
+from image_size import SizeCache
+from class_registry import load_class_registry
 
 # === CONFIG ===
-classes = ["Canister", "Foam", "Ring", "Tyvek", "Wafer"]
+# class names and file name patterns shared with the YOLO labeler, classes.json replaces the defaults
+class_registry = load_class_registry()
 
 bbox_presets = {
     "6 inch": (0.49954802858976477, 0.5574033282796372, 0.43050458369337075, 0.6787368486225077),
     "8 inch": (0.4936826531694092, 0.5458452479416916, 0.5703962017917926, 0.8867322545523849)
 }
 
+# presets estimated from a label corpus with preset_stats.py are offered next to the built-in ones
+preset_config = load_preset_config()
+if preset_config:
+    bbox_presets.update({name: tuple(box) for name, box in preset_config["presets"].items()})
+
+NULL_TIMER = StageTimer()
+
+# flagged images only exist in the YOLO labeler, here an image is labeled or it isn't
+OVERLAY_CHOICES = ("all", "every", "off")
+
+def find_class_index(filename):
+    """Index of the class whose pattern matches the filename, None if there is none"""
+    return class_registry.match(filename)
+
+def preset_box_pixels(preset, w_img, h_img):
+    """Pixel corners (x1, y1, x2, y2) of a normalized xywh preset box"""
+    x, y, w, h = preset
+    x_c = x * w_img
+    y_c = y * h_img
+    w_box = w * w_img
+    h_box = h * h_img
+    x1, y1 = int(x_c - w_box / 2), int(y_c - h_box / 2)
+    x2, y2 = int(x_c + w_box / 2), int(y_c + h_box / 2)
+    return x1, y1, x2, y2
+
+def label_preset_image(image_folder, filename, preset, label_folder, file_label_folder,
+                       draw_overlay=True, transfer_mode="copy", timer=None, encoder=None, futures=None,
+                       sizes=None):
+    """Write the preset label of one image and draw its overlay from the same decoded frame.
+
+    Without an overlay the image is never decoded, it is put into
+    file_label_folder with transfer_mode (copy, hardlink, reflink, symlink, move, none).
+    With sizes (a SizeCache) its header is checked instead, a file that is
+    not an image is not transferred.
+    Returns "labeled", "no_class" when the filename matches no class, or
+    "unreadable" when the label was written but the image could not be decoded.
+    Stages are timed into timer when one is given. With an encoder the overlay
+    is queued on its pool and the future is appended to futures.
+    """
+    timer = timer or NULL_TIMER
+    class_index = find_class_index(filename)
+    if class_index is None:
+        return "no_class"
+
+    x, y, w, h = preset
+    txt_path = os.path.join(label_folder, os.path.splitext(filename)[0] + ".txt")
+    with timer.stage("label write"):
+        with open(txt_path, "w") as f:
+            f.write(f"{class_index} {x} {y} {w} {h}\n")
+
+    img_path = os.path.join(image_folder, filename)
+    if not draw_overlay:
+        if sizes is not None:
+            with timer.stage("probe"):
+                if sizes.get(img_path) is None:
+                    return "unreadable"
+        with timer.stage("copy"):
+            transfer_file(img_path, os.path.join(file_label_folder, filename), transfer_mode)
+        return "labeled"
+
+    with timer.stage("read"):
+        img = cv2.imread(img_path)
+    if img is None:
+        return "unreadable"
+
+    with timer.stage("draw"):
+        h_img, w_img = img.shape[:2]
+        x1, y1, x2, y2 = preset_box_pixels(preset, w_img, h_img)
+        cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    overlay_path = os.path.join(file_label_folder, filename)
+    if encoder is None:
+        with timer.stage("imwrite"):
+            cv2.imwrite(overlay_path, img)
+        return "labeled"
+    future = encoder.submit(overlay_path, img)
+    if future is not None and futures is not None:
+        futures.append(future)
+    return "labeled"
+
+class ProgressChannel:
+    """Progress counters written by the worker thread and read by the Tk thread.
+
+    Every update is a plain attribute assignment from a single writer, so
+    the worker never takes a lock or touches a widget; the dialog polls the
+    channel at a fixed frame rate instead.
+    """
+
+    def __init__(self, total=0):
+        # grows while the folder is scanned, skipped counts the images already labeled
+        self.total = total
+        self.skipped = 0
+        self.done = 0
+        self.current_file = ""
+        self.phase = ""
+        self.phase_times = {}
+        self.phase_start = time.perf_counter()
+        # files/s counts from the phase that processes the files
+        self.start = None
+        self.end = None
+        self.finished = False
+        self.error = None
+
+    def start_phase(self, phase):
+        now = time.perf_counter()
+        if self.phase:
+            self.phase_times = {**self.phase_times, self.phase: now - self.phase_start}
+        self.phase_start = now
+        self.phase = phase
+
+    def advance(self, current_file="", count=1):
+        if self.start is None:
+            self.start = self.phase_start
+        self.current_file = current_file
+        self.done += count
+
+    def finish(self, error=None):
+        self.start_phase("")
+        self.end = self.phase_start
+        self.error = error
+        self.finished = True
+
+    def rate(self):
+        if self.start is None:
+            return 0.0
+        elapsed = (self.end or time.perf_counter()) - self.start
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        rate = self.rate()
+        return (self.total - self.done) / rate if rate > 0 else None
+
 class ProgressDialog:
     def __init__(self, parent, title="Processing", max_value=100):
         self.parent = parent
@@ -27,7 +170,7 @@ class ProgressDialog:
         # Create dialog window
         self.dialog = tk.Toplevel(parent)
         self.dialog.title(title)
-        self.dialog.geometry("400x200")
+        self.dialog.geometry("400x250")
         self.dialog.resizable(False, False)
         self.dialog.grab_set()  # Make dialog modal
         
@@ -42,6 +185,9 @@ class ProgressDialog:
         self.progress_var = tk.DoubleVar()
         self.current_file_var = tk.StringVar()
         self.counter_var = tk.StringVar()
+        self.rate_var = tk.StringVar()
+        self.phase_var = tk.StringVar()
+        self.channel = None
         
         self.setup_ui()
         
@@ -63,7 +209,13 @@ class ProgressDialog:
         # Current file label
         self.file_label = tk.Label(main_frame, textvariable=self.current_file_var,
                                   font=('Arial', 9), bg='#f0f0f0', fg='#666666')
-        self.file_label.pack(pady=(0, 10))
+        self.file_label.pack(pady=(0, 2))
+
+        # Throughput, ETA and per-phase timing
+        tk.Label(main_frame, textvariable=self.rate_var,
+                 font=('Arial', 9), bg='#f0f0f0', fg='#333333').pack()
+        tk.Label(main_frame, textvariable=self.phase_var,
+                 font=('Arial', 8), bg='#f0f0f0', fg='#666666').pack(pady=(0, 5))
         
         # Progress frame
         progress_frame = tk.Frame(main_frame, bg='#f0f0f0')
@@ -121,6 +273,33 @@ class ProgressDialog:
         
         self.dialog.update_idletasks()
         
+    def attach(self, channel, on_finish, fps=15):
+        """Poll channel fps times a second on the Tk thread, call on_finish(channel) once it is finished"""
+        self.channel = channel
+        self.on_finish = on_finish
+        self.poll_interval = max(1, int(1000 / fps))
+        self.dialog.after(self.poll_interval, self.poll)
+
+    def poll(self):
+        channel = self.channel
+        if channel.total != self.total_files:
+            # the total grows while the worker is still scanning the folder
+            self.max_value = max(1, channel.total)
+            self.progress_bar.config(maximum=self.max_value)
+            self.set_total_files(channel.total)
+        self.update_progress(channel.done, channel.current_file, channel.done)
+        eta = channel.eta()
+        eta_text = "--:--" if eta is None else time.strftime("%H:%M:%S", time.gmtime(eta))
+        self.rate_var.set(f"{channel.rate():.1f} files/s   ETA {eta_text}")
+        phases = dict(channel.phase_times)
+        if channel.phase:
+            phases[channel.phase] = time.perf_counter() - channel.phase_start
+        self.phase_var.set("   ".join(f"{phase} {seconds:.1f}s" for phase, seconds in phases.items()))
+        if channel.finished:
+            self.on_finish(channel)
+        else:
+            self.dialog.after(self.poll_interval, self.poll)
+
     def cancel_operation(self):
         """Cancel the operation"""
         self.is_cancelled = True
@@ -150,12 +329,24 @@ class AutoLabelingApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Auto Labeling")
-        self.root.geometry("500x600")
+        self.root.geometry("500x690")
         self.root.configure(bg="white")
 
         self.image_folder = ""
         self.output_folder = ""
         self.bbox_size = tk.StringVar(value="6 inch")
+        self.overlay_mode = tk.StringVar(value="all")
+        self.overlay_every = tk.StringVar(value="10")
+        self.transfer_mode = tk.StringVar(value="copy")
+        # "same" keeps the format of the input image, empty quality / level keeps the OpenCV default
+        self.encode_format = tk.StringVar(value="same")
+        self.encode_quality = tk.StringVar(value="")
+        self.png_compression = tk.StringVar(value="")
+        self.stage_timing = tk.BooleanVar(value=False)
+        # subfolders are labeled too, their images keep the relative path below labels and image_label
+        self.recursive = tk.BooleanVar(value=False)
+        # the preview only ever decodes a full-size image once
+        self.preview_cache = ThumbnailCache(size=(400, 250))
 
         self.setup_ui()
 
@@ -176,8 +367,7 @@ class AutoLabelingApp:
 
         # Size selection
         tk.Label(self.root, text="Size:", font=font_label, bg="white").place(x=30, y=150)
-        tk.Radiobutton(self.root, text="6 inch", font=font_btn, variable=self.bbox_size, value="6 inch", bg="white").place(x=100, y=150)
-        tk.Radiobutton(self.root, text="8 inch", font=font_btn, variable=self.bbox_size, value="8 inch", bg="white").place(x=180, y=150)
+        tk.OptionMenu(self.root, self.bbox_size, *bbox_presets, command=lambda _: self.show_preview()).place(x=100, y=145)
 
         # Preview area
         tk.Label(self.root, text="Preview", font=font_label, bg="white").place(x=30, y=200)
@@ -188,6 +378,28 @@ class AutoLabelingApp:
         self.run_button = tk.Button(self.root, text="Run Auto Labeling", font=font_btn, command=self.run_labeling)
         self.run_button.place(x=180, y=510)
 
+        # Which images get boxes drawn, the others are put into image_label as they are
+        tk.Label(self.root, text="Draw boxes:", font=font_btn, bg="white").place(x=30, y=552)
+        tk.OptionMenu(self.root, self.overlay_mode, *OVERLAY_CHOICES).place(x=130, y=547)
+        tk.Label(self.root, text="N:", font=font_btn, bg="white").place(x=230, y=552)
+        tk.Entry(self.root, textvariable=self.overlay_every, width=5).place(x=255, y=553)
+
+        # Image output without boxes
+        tk.Label(self.root, text="Image without boxes:", font=font_btn, bg="white").place(x=30, y=587)
+        tk.OptionMenu(self.root, self.transfer_mode, *TRANSFER_MODES).place(x=190, y=582)
+
+        # Encoding of the images with boxes
+        tk.Label(self.root, text="Format:", font=font_btn, bg="white").place(x=30, y=622)
+        tk.OptionMenu(self.root, self.encode_format, "same", *ENCODE_FORMATS).place(x=100, y=617)
+        tk.Label(self.root, text="Quality:", font=font_btn, bg="white").place(x=200, y=622)
+        tk.Entry(self.root, textvariable=self.encode_quality, width=4).place(x=265, y=623)
+        tk.Label(self.root, text="PNG level:", font=font_btn, bg="white").place(x=310, y=622)
+        tk.Entry(self.root, textvariable=self.png_compression, width=3).place(x=390, y=623)
+
+        # Per-stage timing, written to timing.txt in the output folder
+        tk.Checkbutton(self.root, text="Stage timing", font=font_btn, variable=self.stage_timing, bg="white").place(x=30, y=655)
+        tk.Checkbutton(self.root, text="Include subfolders", font=font_btn, variable=self.recursive, bg="white").place(x=200, y=655)
+
     def select_input(self):
         path = filedialog.askdirectory()
         if path:
@@ -204,154 +416,184 @@ class AutoLabelingApp:
             messagebox.showwarning("Missing folder", "Please select both input and output folders.")
             return
 
-        # Get list of image files
-        image_files = [f for f in os.listdir(self.image_folder) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))]
-        
-        if not image_files:
-            messagebox.showwarning("No images", "No image files found in the selected folder.")
+        try:
+            overlay_every = max(1, int(self.overlay_every.get()))
+            quality = int(self.encode_quality.get()) if self.encode_quality.get().strip() else None
+            png_compression = int(self.png_compression.get()) if self.png_compression.get().strip() else None
+        except ValueError:
+            messagebox.showwarning("Invalid setting", "N, quality and PNG level must be whole numbers.")
             return
+        overlay_mode = self.overlay_mode.get()
+
+        # Skip images already labeled with the same preset in this output folder,
+        # the preset values and class patterns are recorded too, an edited presets.json or
+        # classes.json relabels everything
+        manifest_params = {"bbox_size": self.bbox_size.get(), "preset": bbox_presets[self.bbox_size.get()],
+                           "classes": class_registry.params(), "overlay": overlay_mode,
+                           "overlay_every": overlay_every, "format": self.encode_format.get()}
 
         # Disable the run button
         self.run_button.config(state='disabled')
         
-        # Create progress dialog
-        total_steps = len(image_files) * 2  # 2 steps per image (label + draw)
-        self.progress_dialog = ProgressDialog(self.root, "Auto Labeling", total_steps)
-        self.progress_dialog.set_total_files(len(image_files))
+        # Create progress dialog, the worker raises the total while it scans the folder
+        channel = ProgressChannel()
+        self.progress_dialog = ProgressDialog(self.root, "Auto Labeling", 1)
+        self.progress_dialog.set_total_files(0)
         self.progress_dialog.show()
+        self.progress_dialog.attach(channel, self.finish_labeling)
         
         # Print start message to terminal
         print("="*60)
         print(f"🚀 Starting Auto Labeling Process...")
-        print(f"📁 Input folder: {self.image_folder}")
+        print(f"📁 Input folder: {self.image_folder}" + (" (with subfolders)" if self.recursive.get() else ""))
         print(f"📁 Output folder: {self.output_folder}")
         print(f"📏 Bbox size: {self.bbox_size.get()}")
-        print(f"🖼️  Total images: {len(image_files)}")
         print("="*60)
         
-        # Start processing in a separate thread
-        threading.Thread(target=self.process_images, args=(image_files,), daemon=True).start()
+        # Start processing in a separate thread, it scans, filters and labels
+        # Tk variables are read here, the worker thread never touches Tk
+        preset = bbox_presets[self.bbox_size.get()]
+        self.timer = StageTimer(self.stage_timing.get())
+        encode_format = self.encode_format.get()
+        encoder = ImageEncoder(None if encode_format == "same" else encode_format, quality, png_compression,
+                               timer=self.timer)
+        threading.Thread(target=self.label_folder,
+                         args=(channel, manifest_params, self.recursive.get(), preset, overlay_mode,
+                               self.transfer_mode.get(), overlay_every, encoder),
+                         daemon=True).start()
+
+    def label_folder(self, channel, manifest_params, recursive, *args):
+        """Worker thread: load the manifest, then label the pending images while the folder is being scanned"""
+        try:
+            channel.start_phase("manifest load")
+            self.manifest = Manifest(os.path.join(self.output_folder, "manifest.jsonl"), manifest_params)
+        except Exception as e:
+            print(f"\n❌ Error occurred: {str(e)}")
+            channel.finish(e)
+            return
+        self.process_images(self.iter_pending(channel, recursive), channel, *args)
+
+    def iter_pending(self, channel, recursive=False):
+        """Names of the new or changed images, scanned and filtered one chunk at a time.
 
-    def process_images(self, image_files):
+        The first chunk is labeled while the rest of the folder is still
+        being listed; channel.total and channel.skipped grow as chunks come in.
+        """
+        for chunk in scan_chunks(self.image_folder, recursive=recursive, sort=False):
+            # the scan already holds the size and mtime the manifest compares
+            pending = self.manifest.filter_pending(self.image_folder, [entry.name for entry in chunk],
+                                                   {entry.name: (entry.size, entry.mtime_ns) for entry in chunk})
+            channel.skipped += len(chunk) - len(pending)
+            channel.total += len(pending)
+            yield from pending
+
+    def commit_records(self, pending):
+        """Record images in the manifest in order, each once the encode of its overlay has landed"""
+        while pending and all(future.done() for future in pending[0][2]):
+            filename, status, futures = pending.popleft()
+            if all(future.exception() is None for future in futures):
+                self.manifest.record(filename, {"status": status})
+
+    def process_images(self, image_files, channel, preset, overlay_mode="all", transfer_mode="copy",
+                       overlay_every=1, encoder=None):
+        """Worker thread: only writes to channel, the dialog reads it from the Tk thread.
+
+        image_files may be a generator, e.g. iter_pending, that raises channel.total as it goes.
+        """
+        error = None
+        timer = self.timer
+        # overlays are encoded on the encoder pool while the next image is labeled
+        encoder = encoder or ImageEncoder(timer=timer)
+        pending = deque()
+        sizes = None
         try:
+            channel.start_phase("prepare")
             # Create output directories
             os.makedirs(self.output_folder, exist_ok=True)
             label_folder = os.path.join(self.output_folder, "labels")
             os.makedirs(label_folder, exist_ok=True)
-            
-            x, y, w, h = bbox_presets[self.bbox_size.get()]
-            current_step = 0
-            
-            print("\n📝 Phase 1: Generating label files...")
-            
-            # Step 1: Generate label files with tqdm progress bar
-            with tqdm(total=len(image_files), desc="Labeling", unit="file", 
-                     bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}{postfix}]") as pbar:
-                
-                for i, filename in enumerate(image_files, 1):
-                    if self.progress_dialog.is_cancelled:
-                        break
-                        
-                    # Update GUI progress
-                    current_step += 1
-                    self.progress_dialog.update_progress(current_step, f"Labeling: {filename}", i)
-                    
-                    # Update terminal progress
-                    pbar.set_postfix_str(f"Processing: {filename}")
-                    
-                    # Generate label
-                    class_index = None
-                    for idx, cname in enumerate(classes):
-                        if cname.lower() in filename.lower():
-                            class_index = idx
-                            break
-                            
-                    if class_index is not None:
-                        line = f"{class_index} {x} {y} {w} {h}\n"
-                        txt_path = os.path.join(label_folder, os.path.splitext(filename)[0] + ".txt")
-                        with open(txt_path, "w") as f:
-                            f.write(line)
-                    
-                    # Update progress bar
-                    pbar.update(1)
-                    
-                    # Small delay to show progress
-                    time.sleep(0.01)
-            
-            if self.progress_dialog.is_cancelled:
-                print("\n❌ Operation cancelled by user")
-                self.cleanup_and_enable()
-                return
-            
-            print("\n🎨 Phase 2: Drawing bounding boxes and saving images...")
-            
-            # Step 2: Draw bounding boxes and save images with tqdm progress bar
             file_label_folder = os.path.join(self.output_folder, "image_label")
             os.makedirs(file_label_folder, exist_ok=True)
+            # images labeled without an overlay are only checked by their header size
+            sizes = SizeCache(self.output_folder) if overlay_mode != "all" else None
+            # subfolders of a recursive scan, created once below labels and image_label
+            subfolders = set()
+            
+            print("\n📝 Labeling and drawing bounding boxes in one pass...")
+            channel.start_phase("labeling")
             
-            with tqdm(total=len(image_files), desc="Drawing", unit="file",
+            with tqdm(total=channel.total, desc="Labeling", unit="file", 
                      bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}{postfix}]") as pbar:
                 
                 for i, filename in enumerate(image_files, 1):
                     if self.progress_dialog.is_cancelled:
                         break
                         
-                    # Update GUI progress
-                    current_step += 1
-                    self.progress_dialog.update_progress(current_step, f"Drawing: {filename}", i)
-                    
-                    # Update terminal progress
-                    pbar.set_postfix_str(f"Processing: {filename}")
-                    
-                    # Process image
-                    img_path = os.path.join(self.image_folder, filename)
-                    label_path = os.path.join(label_folder, os.path.splitext(filename)[0] + ".txt")
-                    img = cv2.imread(img_path)
+                    # Terminal progress is redrawn on tqdm's own schedule, not per file
+                    pbar.total = channel.total
+                    pbar.set_postfix_str(f"Processing: {filename}", refresh=False)
+
+                    subfolder = os.path.dirname(filename)
+                    if subfolder and subfolder not in subfolders:
+                        os.makedirs(os.path.join(label_folder, subfolder), exist_ok=True)
+                        os.makedirs(os.path.join(file_label_folder, subfolder), exist_ok=True)
+                        subfolders.add(subfolder)
                     
-                    if img is None or not os.path.exists(label_path):
-                        pbar.update(1)
-                        continue
-
-                    h_img, w_img = img.shape[:2]
-                    with open(label_path, "r") as f:
-                        lines = f.readlines()
-
-                    for line in lines:
-                        parts = line.strip().split()
-                        if len(parts) == 5:
-                            _, x_center, y_center, width, height = map(float, parts)
-                            x_c = x_center * w_img
-                            y_c = y_center * h_img
-                            w_box = width * w_img
-                            h_box = height * h_img
-                            x1, y1 = int(x_c - w_box / 2), int(y_c - h_box / 2)
-                            x2, y2 = int(x_c + w_box / 2), int(y_c + h_box / 2)
-                            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-
-                    cv2.imwrite(os.path.join(file_label_folder, filename), img)
+                    futures = []
+                    status = label_preset_image(self.image_folder, filename, preset,
+                                                label_folder, file_label_folder,
+                                                wants_overlay(overlay_mode, i - 1, overlay_every),
+                                                transfer_mode, timer, encoder, futures, sizes)
+                    if status != "unreadable":
+                        pending.append((filename, status, futures))
+                    with timer.stage("manifest"):
+                        self.commit_records(pending)
                     
                     # Update progress bar
+                    channel.advance(filename)
                     pbar.update(1)
-                    
-                    # Small delay to show progress
-                    time.sleep(0.01)
-            
-            # Complete or cancelled
-            if self.progress_dialog.is_cancelled:
-                print("\n❌ Operation cancelled by user")
-                self.cleanup_and_enable()
-                messagebox.showinfo("Cancelled", "Auto labeling was cancelled.")
-            else:
-                self.progress_dialog.complete_operation()
-                self.show_preview()
-                messagebox.showinfo("Success", "Auto labeling completed successfully!")
-                
+
+            # overlays still queued are part of labeling
+            encoder.close()
+            channel.start_phase("manifest")
+            if timer.enabled:
+                print(timer.write(self.output_folder, channel.phase_times.get("labeling")), end="")
         except Exception as e:
             print(f"\n❌ Error occurred: {str(e)}")
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            error = e
         finally:
-            self.cleanup_and_enable()
+            try:
+                encoder.close()
+            except Exception as e:
+                error = error or e
+            # every encode has finished, whatever landed is recorded
+            self.commit_records(pending)
+            self.manifest.close()
+            if sizes is not None:
+                sizes.close()
+            channel.finish(error)
+
+    def finish_labeling(self, channel):
+        """Tk thread: report the result once the worker has finished"""
+        if channel.error is not None:
+            messagebox.showerror("Error", f"An error occurred: {str(channel.error)}")
+        elif self.progress_dialog.is_cancelled:
+            print("\n❌ Operation cancelled by user")
+            messagebox.showinfo("Cancelled", "Auto labeling was cancelled.")
+        elif channel.done == 0:
+            self.progress_dialog.close_dialog()
+            if channel.skipped:
+                messagebox.showinfo("Up to date", "All images are already labeled in the output folder.")
+            else:
+                messagebox.showwarning("No images", "No image files found in the selected folder.")
+        else:
+            self.progress_dialog.complete_operation()
+            phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in channel.phase_times.items())
+            print(f"🖼️  {channel.done} images labeled ({channel.skipped} already done)")
+            print(f"⏱️  {channel.rate():.1f} files/s ({phases})")
+            self.show_preview()
+            messagebox.showinfo("Success", "Auto labeling completed successfully!")
+        self.cleanup_and_enable()
 
     def cleanup_and_enable(self):
         """Re-enable the run button"""
@@ -361,31 +603,28 @@ class AutoLabelingApp:
         if not self.image_folder:
             return
 
-        files = [f for f in os.listdir(self.image_folder) if f.lower().endswith(('.jpg', '.png', '.jpeg', '.bmp'))]
+        # a sample from the start of the folder, a huge folder is never listed just for one preview
+        files = [entry.name for entry in islice(scan_files(self.image_folder, recursive=False, sort=False), 256)]
         if not files:
             return
 
         selected = random.choice(files)
         img_path = os.path.join(self.image_folder, selected)
-        img = cv2.imread(img_path)
+        thumb_path = self.preview_cache.get(img_path)
 
-        if img is None:
+        if thumb_path is None:
             return
 
+        # normalized preset, so drawing on the thumbnail matches drawing on the full image
+        img = cv2.imread(thumb_path)
+        if img is None:
+            return
         h_img, w_img = img.shape[:2]
-        x, y, w, h = bbox_presets[self.bbox_size.get()]
-        x_c = x * w_img
-        y_c = y * h_img
-        w_box = w * w_img
-        h_box = h * h_img
-
-        x1, y1 = int(x_c - w_box / 2), int(y_c - h_box / 2)
-        x2, y2 = int(x_c + w_box / 2), int(y_c + h_box / 2)
+        x1, y1, x2, y2 = preset_box_pixels(bbox_presets[self.bbox_size.get()], w_img, h_img)
 
         cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
         img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         pil_img = Image.fromarray(img)
-        pil_img.thumbnail((400, 250))
         self.tk_img = ImageTk.PhotoImage(pil_img)
         self.canvas.create_image(200, 125, image=self.tk_img)
 
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    """Content hash of a file, read in chunks so large photos never sit in memory."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Per-image outcome of a labeling run, stored as JSON lines in the output folder.
+
+    Each line records the file name, its size/mtime (and optionally a content
+    hash), the run parameters and the outcome. The file is append-only, so a
+    crash loses at most the records that were not flushed yet; the last line
+    for a name wins when the manifest is loaded again.
+    """
+
+    def __init__(self, path, params=None, use_hash=False):
+        self.path = path
+        # round trip through JSON so tuples compare equal to the loaded lists
+        self.params = json.loads(json.dumps(params or {}))
+        self.use_hash = use_hash
+        self.entries = {}
+        self.keys = {}
+        self.file = None
+        # filter_pending may run on a scanner thread while records are written
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            self.load(path)
+
+    def load(self, path):
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # torn last line after a crash
+                    continue
+                self.entries[entry["name"]] = entry
+
+    def is_current(self, entry):
+        return entry.get("params") == self.params
+
+    def filter_pending(self, folder, file_names, stats=None):
+        """Return the files that are new or changed since they were last recorded.
+
+        stats optionally maps a name to the (size, mtime_ns) a directory scan
+        already read, those files are not stat'ed again.
+        """
+        pending = []
+        for name in file_names:
+            file_path = os.path.join(folder, name)
+            if stats is not None and name in stats:
+                size, mtime = stats[name]
+            else:
+                st = os.stat(file_path)
+                size, mtime = st.st_size, st.st_mtime_ns
+            key = {"size": size, "mtime": mtime}
+            entry = self.entries.get(name)
+            if entry is not None and self.is_current(entry):
+                if entry["size"] == key["size"] and entry["mtime"] == key["mtime"]:
+                    continue
+                if self.use_hash and "hash" in entry:
+                    key["hash"] = file_hash(file_path)
+                    if key["hash"] == entry["hash"]:
+                        # touched but not changed, refresh the stat so the next run skips the hash
+                        self.keys[name] = key
+                        self.record(name, entry["outcome"])
+                        continue
+            if self.use_hash and "hash" not in key:
+                key["hash"] = file_hash(file_path)
+            self.keys[name] = key
+            pending.append(name)
+        return pending
+
+    def record(self, name, outcome):
+        entry = {"name": name}
+        entry.update(self.keys.pop(name, {}))
+        entry["params"] = self.params
+        entry["outcome"] = outcome
+        self.write(entry)
+
+    def write(self, entry):
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a")
+            self.file.write(line)
+            self.entries[entry["name"]] = entry
+
+    def merge(self, path):
+        """Append the records of another manifest (e.g. a worker shard) to this one."""
+        if not os.path.exists(path):
+            return
+        other = Manifest(path)
+        for entry in other.entries.values():
+            self.write(entry)
+
+    def current_entries(self):
+        return [entry for entry in self.entries.values() if self.is_current(entry)]
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
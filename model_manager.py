@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# warm-up size when neither a warm-up nor an inference size is set, the usual YOLO training size
+DEFAULT_WARMUP_IMGSZ = 640
+
+
+class ModelManager:
+    """Loads each weight file once and keeps the most recently used models warm.
+
+    Models are cached by absolute path, mtime and backend, so switching back to a
+    recently used weight file is instant and an overwritten file is reloaded.
+    Every new model gets `warmup_runs` dummy inferences so the first real
+    image does not pay the fuse / graph warm-up cost. They run at the
+    inference imgsz passed to get, unless `warmup_imgsz` overrides it.
+    """
+
+    def __init__(self, loader, max_models=4, warmup_imgsz=None, warmup_runs=1):
+        self.loader = loader
+        self.max_models = max_models
+        self.warmup_imgsz = warmup_imgsz
+        self.warmup_runs = warmup_runs
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+        self.load_time = 0.0
+        self.warmup_time = 0.0
+
+    def set_warmup(self, warmup_imgsz=None, warmup_runs=1):
+        self.warmup_imgsz = warmup_imgsz
+        self.warmup_runs = warmup_runs
+
+    def cache_key(self, model_path, backend):
+        model_path = os.path.abspath(model_path)
+        mtime = os.stat(model_path).st_mtime_ns if os.path.exists(model_path) else None
+        return model_path, mtime, backend
+
+    def warmup(self, model, imgsz=None):
+        # the model is run at the same size as the real images, without one it keeps its own default
+        size = self.warmup_imgsz or imgsz
+        side = size or DEFAULT_WARMUP_IMGSZ
+        dummy = np.zeros((side, side, 3), dtype=np.uint8)
+        kwargs = {"imgsz": size} if size else {}
+        for _ in range(self.warmup_runs):
+            model(dummy, verbose=False, **kwargs)
+
+    def get(self, model_path, backend="auto", imgsz=None):
+        """Return a loaded, warmed-up model; load_time / warmup_time are 0 on a cache hit.
+
+        imgsz is the inference size the model will run at, None for its default.
+        """
+        key = self.cache_key(model_path, backend)
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                self.load_time = 0.0
+                self.warmup_time = 0.0
+                return self.models[key]
+
+            start = time.perf_counter()
+            model = self.loader(model_path, backend)
+            self.load_time = time.perf_counter() - start
+            start = time.perf_counter()
+            self.warmup(model, imgsz)
+            self.warmup_time = time.perf_counter() - start
+
+            # drop older versions of the same file and the least recently used models
+            for old_key in [k for k in self.models if k[0] == key[0] and k[2] == key[2]]:
+                del self.models[old_key]
+            self.models[key] = model
+            while len(self.models) > self.max_models:
+                self.models.popitem(last=False)
+            return model
@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from class_registry import load_class_registry
+from scanner import scan_files
+
+CLASS_NAMES = load_class_registry().names
+
+# written by this tool, read at startup by labeledit.py and program
+PRESET_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "presets.json")
+
+FIELDS = ("x", "y", "w", "h")
+
+
+def load_preset_config(path=PRESET_CONFIG):
+    """Presets and acceptance ranges written by this tool, None when there is no config file."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def iter_label_files(label_dir):
+    """Every .txt below label_dir, streamed with scandir so the listing never sits in memory."""
+    for entry in scan_files(label_dir, (".txt",), sort=False):
+        yield entry.path
+
+
+def read_boxes(path):
+    """(class id, x, y, w, h) rows of one YOLO label file, malformed lines are skipped."""
+    rows = []
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 5:
+                try:
+                    rows.append([float(v) for v in parts])
+                except ValueError:
+                    continue
+    return rows
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BoxStats:
+    """Streaming statistics of the normalized boxes of one class.
+
+    Everything is kept in fixed histograms of `bins` bins per field, so
+    memory does not grow with the corpus; medians and quantiles are exact
+    to 1/bins. Per width bin sums of the whole box give the mean box of
+    each size group.
+    """
+
+    def __init__(self, bins=1000):
+        self.bins = bins
+        self.count = 0
+        self.sum = np.zeros(4)
+        self.min = np.full(4, np.inf)
+        self.max = np.full(4, -np.inf)
+        self.hist = np.zeros((4, bins), dtype=np.int64)
+        self.w_bin_sum = np.zeros((bins, 4))
+
+    def add(self, boxes):
+        boxes = np.clip(boxes, 0.0, 1.0)
+        idx = np.minimum((boxes * self.bins).astype(int), self.bins - 1)
+        for k in range(4):
+            self.hist[k] += np.bincount(idx[:, k], minlength=self.bins)
+        np.add.at(self.w_bin_sum, idx[:, 2], boxes)
+        self.count += len(boxes)
+        self.sum += boxes.sum(axis=0)
+        self.min = np.minimum(self.min, boxes.min(axis=0))
+        self.max = np.maximum(self.max, boxes.max(axis=0))
+
+    def quantile(self, q, k, lo_bin=0, hi_bin=None):
+        """q-quantile of field k, optionally only over bins lo_bin..hi_bin."""
+        hist = self.hist[k, lo_bin:(self.bins if hi_bin is None else hi_bin + 1)]
+        cum = np.cumsum(hist)
+        target = q * cum[-1]
+        i = min(int(np.searchsorted(cum, target)), len(hist) - 1)
+        before = cum[i - 1] if i > 0 else 0
+        frac = (target - before) / hist[i] if hist[i] else 0.0
+        value = (lo_bin + i + frac) / self.bins
+        return float(np.clip(value, self.min[k], self.max[k]))
+
+    def groups(self, k, gap=0.02, min_share=0.01):
+        """Bin ranges of the clusters of field k, split wherever `gap` of the axis is empty."""
+        gap_bins = max(1, int(round(gap * self.bins)))
+        groups, start, last = [], None, None
+        for i in np.flatnonzero(self.hist[k]):
+            if start is None:
+                start = i
+            elif i - last > gap_bins:
+                groups.append((start, last))
+                start = i
+            last = i
+        if start is not None:
+            groups.append((start, last))
+        # a handful of stray boxes is not a size of its own
+        return [(lo, hi) for lo, hi in groups
+                if self.hist[k, lo:hi + 1].sum() >= min_share * self.count]
+
+    def ranges(self, k, low=0.01, high=0.99, margin=0.02, gap=0.02):
+        return [[max(0.0, self.quantile(low, k, lo, hi) - margin), min(1.0, self.quantile(high, k, lo, hi) + margin)]
+                for lo, hi in self.groups(k, gap)]
+
+    def presets(self, gap=0.02):
+        """Mean box of every width group, smallest first."""
+        boxes = []
+        for lo, hi in self.groups(2, gap):
+            count = self.hist[2, lo:hi + 1].sum()
+            boxes.append((self.w_bin_sum[lo:hi + 1].sum(axis=0) / count).tolist())
+        return boxes
+
+    def summary(self, quantiles=(0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99), histogram_bins=100):
+        step = self.bins // histogram_bins
+        return {
+            "count": int(self.count),
+            "mean": (self.sum / self.count).tolist(),
+            "median": [self.quantile(0.5, k) for k in range(4)],
+            "min": self.min.tolist(),
+            "max": self.max.tolist(),
+            "quantiles": {str(q): [self.quantile(q, k) for k in range(4)] for q in quantiles},
+            # coarse histograms of w and h for a quick look, fields are in FIELDS order
+            "histogram": {FIELDS[k]: self.hist[k].reshape(histogram_bins, step).sum(axis=1).tolist() for k in (2, 3)},
+        }
+
+
+def merge_ranges(ranges):
+    """Union of overlapping [lower, upper] intervals, sorted."""
+    merged = []
+    for lower, upper in sorted(ranges):
+        if merged and lower <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], upper)
+        else:
+            merged.append([lower, upper])
+    return merged
+
+
+def collect_stats(label_dir, bins=1000, workers=8, chunk_size=4096):
+    """{class id: BoxStats} over every label file below label_dir, one pass."""
+    stats = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # files are read in chunks, only one chunk of paths and rows is in memory at a time
+        for paths in chunked(iter_label_files(label_dir), chunk_size):
+            rows = [row for file_rows in pool.map(read_boxes, paths) for row in file_rows]
+            if not rows:
+                continue
+            rows = np.asarray(rows)
+            classes = rows[:, 0].astype(int)
+            for class_id in np.unique(classes):
+                if class_id not in stats:
+                    stats[class_id] = BoxStats(bins)
+                stats[class_id].add(rows[classes == class_id, 1:])
+    return stats
+
+
+def build_config(stats, class_names=CLASS_NAMES, low=0.01, high=0.99, margin=0.02, gap=0.02):
+    config = {"fields": list(FIELDS), "classes": {}, "presets": {}, "w_ranges": [], "h_ranges": []}
+    w_ranges, h_ranges = [], []
+    for class_id in sorted(stats):
+        class_stats = stats[class_id]
+        name = class_names[class_id] if 0 <= class_id < len(class_names) else str(class_id)
+        config["classes"][name] = dict(id=int(class_id), **class_stats.summary())
+        presets = class_stats.presets(gap)
+        for i, box in enumerate(presets):
+            config["presets"][name if len(presets) == 1 else f"{name} {i + 1}"] = box
+        w_ranges += class_stats.ranges(2, low, high, margin, gap)
+        h_ranges += class_stats.ranges(3, low, high, margin, gap)
+    config["w_ranges"] = merge_ranges(w_ranges)
+    config["h_ranges"] = merge_ranges(h_ranges)
+    return config
+
+
+def degenerate_reasons(stats, min_boxes=50, min_spread=0.01):
+    """Why the corpus is too small or too uniform to estimate acceptance ranges from, empty when it is fine.
+
+    Ranges from a handful of boxes of one size would reject every other
+    size, e.g. a corpus of 6 inch boxes only rejects every 8 inch box.
+    """
+    reasons = []
+    total = sum(int(class_stats.count) for class_stats in stats.values())
+    if total < min_boxes:
+        reasons.append(f"only {total} boxes, fewer than --min-boxes {min_boxes}")
+    for class_id in sorted(stats):
+        spread = stats[class_id].max[2:4] - stats[class_id].min[2:4]
+        if (spread < min_spread).any():
+            reasons.append(f"class {class_id} w/h spread {spread[0]:.4f}/{spread[1]:.4f}, below --min-spread {min_spread}")
+    return reasons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate box presets and w/h acceptance ranges from YOLO label files")
+    parser.add_argument("labels", help="folder of YOLO txt label files, searched recursively")
+    parser.add_argument("--output", default=PRESET_CONFIG, help="config file to write")
+    parser.add_argument("--classes", nargs="+", default=CLASS_NAMES, help="class names in class id order")
+    parser.add_argument("--bins", type=int, default=1000, help="histogram bins per field, a multiple of 100")
+    parser.add_argument("--low", type=float, default=0.01, help="lower quantile of each acceptance range")
+    parser.add_argument("--high", type=float, default=0.99, help="upper quantile of each acceptance range")
+    parser.add_argument("--margin", type=float, default=0.02, help="added on both sides of each range")
+    parser.add_argument("--gap", type=float, default=0.02, help="empty width that separates two size groups")
+    parser.add_argument("--workers", type=int, default=8, help="file reader threads")
+    parser.add_argument("--min-boxes", type=int, default=50, help="fewer boxes than this write no acceptance ranges")
+    parser.add_argument("--min-spread", type=float, default=0.01,
+                        help="a class whose box w or h varies less than this writes no acceptance ranges")
+    parser.add_argument("--force", action="store_true", help="write the acceptance ranges of a degenerate corpus anyway")
+    args = parser.parse_args(argv)
+
+    stats = collect_stats(args.labels, args.bins, args.workers)
+    if not stats:
+        parser.error(f"no labels found in {args.labels}")
+    config = build_config(stats, args.classes, args.low, args.high, args.margin, args.gap)
+    reasons = degenerate_reasons(stats, args.min_boxes, args.min_spread)
+    for reason in reasons:
+        print(f"warning : {reason}")
+    if reasons and not args.force:
+        # the presets are still useful, the labelers keep their built-in ranges without these keys
+        del config["w_ranges"], config["h_ranges"]
+        print("acceptance ranges not written, the built-in ranges stay in effect (--force writes them anyway)")
+    with open(args.output, "w") as f:
+        json.dump(config, f, indent=2)
+
+    for name, box in config["presets"].items():
+        print(f"{name:>14} : " + " ".join(f"{v:.4f}" for v in box))
+    if "w_ranges" in config:
+        print(f"w ranges : {config['w_ranges']}")
+        print(f"h ranges : {config['h_ranges']}")
+    print(f"written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+import csv
+import json
+import os
+import time
+
+from stage_timer import StageTimer
+
+STRUCTURED_FIELDS = ["file", "status", "reports", "conf", "w", "h"]
+
+
+def structured_report_file(report_path, fmt):
+    return os.path.join(report_path, "report.{ext}".format(ext=fmt))
+
+
+def write_records(file, records, fmt, header=False):
+    """Write per-image records as JSON lines or CSV rows (lists joined with ';')."""
+    if fmt == "jsonl":
+        file.writelines(json.dumps(record) + "\n" for record in records)
+        return
+    writer = csv.writer(file)
+    if header:
+        writer.writerow(STRUCTURED_FIELDS)
+    for record in records:
+        row = []
+        for field in STRUCTURED_FIELDS:
+            value = record.get(field, "")
+            if isinstance(value, list):
+                value = ";".join(str(v) for v in value)
+            row.append(value)
+        writer.writerow(row)
+
+
+class ReportWriter:
+    """Buffered writer for the report folder of one labeling run.
+
+    Report lines are kept in memory and written through handles that stay
+    open for the whole run, flushed every `flush_every` lines or
+    `flush_interval` seconds and when the writer is closed. With
+    `structured` set to "jsonl" or "csv", one record per image (reason codes,
+    confidences, box sizes) is also written to report/report.<fmt>.
+    """
+
+    def __init__(self, report_path, report_names, structured=None, flush_every=256, flush_interval=5.0, timer=None):
+        self.report_path = report_path
+        self.timer = timer or StageTimer()
+        self.structured = structured
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.lines = {name: [] for name in report_names}
+        self.records = []
+        self.handles = {}
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, report_name, name):
+        self.lines[report_name].append("{f} \n".format(f=name))
+        self.pending += 1
+        self.maybe_flush()
+
+    def add_record(self, record):
+        if self.structured is None:
+            return
+        self.records.append(record)
+        self.pending += 1
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if self.pending >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def handle(self, key, file_path):
+        if key not in self.handles:
+            new_file = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+            self.handles[key] = (open(file_path, "a", newline="" if key == "structured" else None), new_file)
+        return self.handles[key][0]
+
+    def flush(self):
+        with self.timer.stage("report write"):
+            self.write_pending()
+
+    def write_pending(self):
+        for report_name, lines in self.lines.items():
+            if lines:
+                file = self.handle(report_name, os.path.join(self.report_path, report_name + ".txt"))
+                file.writelines(lines)
+                file.flush()
+                lines.clear()
+        if self.records:
+            file = self.handle("structured", structured_report_file(self.report_path, self.structured))
+            header = self.handles["structured"][1]
+            write_records(file, self.records, self.structured, header=header)
+            self.handles["structured"] = (file, False)
+            file.flush()
+            self.records.clear()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        for file, _ in self.handles.values():
+            file.close()
+        self.handles = {}
@@ -0,0 +1,64 @@
+import os
+from typing import NamedTuple
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class ScanEntry(NamedTuple):
+    name: str  # relative to the scanned folder, "/" between folders on every platform
+    path: str
+    size: int
+    mtime_ns: int
+
+
+def scan_files(folder, extensions=IMAGE_EXTENSIONS, recursive=True, sort=True):
+    """Yield a ScanEntry for every file below folder whose name ends with one of extensions.
+
+    Entries are produced lazily, one directory listing at a time, and each
+    file is stat'ed only when it is yielded. With sort=True every directory
+    is listed in name order and subfolders are walked where they sort, so
+    the same tree always gives the same order; sort=False yields in
+    scandir order without holding any listing. extensions=None yields
+    every file.
+    """
+    extensions = tuple(ext.lower() for ext in extensions) if extensions else None
+    # one iterator per open directory, depth first
+    stack = [iter_directory(folder, "", sort)]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+        rel_dir, entry = entry
+        name = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        if entry.is_dir():
+            if recursive:
+                stack.append(iter_directory(entry.path, name, sort))
+        elif entry.is_file() and (extensions is None or entry.name.lower().endswith(extensions)):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                # removed between the listing and the stat, e.g. a folder still being written to
+                continue
+            yield ScanEntry(name, entry.path, st.st_size, st.st_mtime_ns)
+
+
+def iter_directory(path, rel_dir, sort):
+    with os.scandir(path) as entries:
+        if sort:
+            # names only, DirEntry keeps the file type so nothing is stat'ed here
+            entries = sorted(entries, key=lambda entry: entry.name)
+        for entry in entries:
+            yield rel_dir, entry
+
+
+def scan_chunks(folder, chunk_size=1024, **kwargs):
+    """scan_files in lists of up to chunk_size entries, the first list is ready after chunk_size files."""
+    chunk = []
+    for entry in scan_files(folder, **kwargs):
+        chunk.append(entry)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
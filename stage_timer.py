@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from array import array
+from contextlib import nullcontext
+
+import numpy as np
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+# shared by every disabled timer, entering it costs next to nothing
+NULL_STAGE = nullcontext()
+
+
+class Stage:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        # nested stages are subtracted from their parent, every second is counted once
+        stack = self.timer.stack()
+        stack.append(0.0)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = self.timer.stack()
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        self.timer.add(self.name, elapsed - children)
+        return False
+
+
+class StageTimer:
+    """Wall time samples per pipeline stage, safe to use from any thread.
+
+    Disabled timers hand out one shared no-op context and return wrapped
+    functions unchanged, so instrumented code pays a method call at most.
+    Nested stages record their own time only; stages running on worker
+    threads overlap the main thread, so totals can add up to more than
+    the wall time of the run.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.samples = {}
+        self.local = threading.local()
+
+    def stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def wrap(self, name, fn):
+        if not self.enabled:
+            return fn
+
+        def timed(*args, **kwargs):
+            with Stage(self, name):
+                return fn(*args, **kwargs)
+        return timed
+
+    def add(self, name, seconds):
+        # array.append holds the GIL, threads can add to the same stage without a lock
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples.setdefault(name, array("d"))
+        samples.append(seconds)
+
+    def merge(self, samples):
+        """Add the samples of another timer, e.g. returned by a worker process."""
+        for name, values in samples.items():
+            self.samples.setdefault(name, array("d")).extend(values)
+
+    def summary(self):
+        summary = {}
+        for name, values in self.samples.items():
+            values = np.frombuffer(values, dtype=np.float64) if len(values) else np.zeros(1)
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            summary[name] = {
+                "count": len(self.samples[name]),
+                "total": float(values.sum()),
+                "mean": float(values.mean()),
+                "p50": float(p50),
+                "p90": float(p90),
+                "p99": float(p99),
+                "max": float(values.max()),
+            }
+        return summary
+
+    def write(self, folder, wall_time=None, name="timing"):
+        """Write <name>.txt (table) and <name>.json into folder, return the table."""
+        summary = self.summary()
+        total = sum(stage["total"] for stage in summary.values()) or 1.0
+        lines = [f"{'stage':<14} {'count':>8} {'total s':>10} {'share':>7} {'mean ms':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for stage, s in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+            lines.append(f"{stage:<14} {s['count']:>8} {s['total']:>10.3f} {s['total'] / total * 100:>6.1f}% "
+                         f"{s['mean'] * 1000:>9.2f} {s['p50'] * 1000:>9.2f} {s['p90'] * 1000:>9.2f} "
+                         f"{s['p99'] * 1000:>9.2f} {s['max'] * 1000:>9.2f}")
+        if wall_time is not None:
+            lines.append(f"wall time {wall_time:.3f}s, stages on worker threads overlap it")
+        table = "\n".join(lines) + "\n"
+        with open(os.path.join(folder, name + ".txt"), "w") as f:
+            f.write(table)
+        with open(os.path.join(folder, name + ".json"), "w") as f:
+            json.dump({"wall_time": wall_time, "stages": summary}, f, indent=2)
+        return table
+
+
+class Profiler:
+    """Optional cProfile / pyinstrument run of the calling thread, dumped into a folder."""
+
+    def __init__(self, kind=None):
+        if kind not in (None, *PROFILERS):
+            raise ValueError(f"unknown profiler: {kind}")
+        self.kind = kind
+        self.profiler = None
+
+    def start(self):
+        if self.kind == "cprofile":
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.kind == "pyinstrument":
+            # optional dependency, only needed when it is asked for
+            from pyinstrument import Profiler as PyinstrumentProfiler
+            self.profiler = PyinstrumentProfiler()
+            self.profiler.start()
+
+    def stop(self, folder):
+        """Stop and dump to folder, return the dump path or None."""
+        if self.profiler is None:
+            return None
+        if self.kind == "cprofile":
+            self.profiler.disable()
+            path = os.path.join(folder, "profile.prof")
+            self.profiler.dump_stats(path)
+        else:
+            self.profiler.stop()
+            path = os.path.join(folder, "profile.html")
+            with open(path, "w") as f:
+                f.write(self.profiler.output_html())
+        self.profiler = None
+        return path
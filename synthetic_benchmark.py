@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from auto_label_ver_4byfrank import program
+from backends import NumpyBoxes, NumpyResult
+from encoding import OVERLAY_MODES
+from labeledit import AutoLabelingApp, ProgressChannel, bbox_presets
+from manifest import Manifest
+from stage_timer import StageTimer
+from transfer import TRANSFER_MODES, remove_existing, transfer_file
+
+CLASS_PREFIXES = ["canister", "foam", "ring", "tyvek", "wafer"]
+
+# background level of the top-left corner tells the stub detector what to return,
+# coarse enough to survive JPEG compression
+BACKGROUND_EMPTY = 30
+BACKGROUND_ONE = 128
+BACKGROUND_TWO = 220
+
+
+def make_images(folder, count=200, size=(1920, 1080), ext=".jpg", seed=0):
+    """Write count synthetic wafer-style photos named <class>_<nnnnn><ext>, return the file names.
+
+    Every 10th image has a dark background (the stub finds nothing) and the
+    one before it a bright one (the stub finds two boxes), the rest get one
+    box. The same seed always gives the same files; images that already
+    exist are kept.
+    """
+    os.makedirs(folder, exist_ok=True)
+    width, height = size
+    names = []
+    for i in range(count):
+        name = f"{CLASS_PREFIXES[i % len(CLASS_PREFIXES)]}_{i:05d}{ext}"
+        names.append(name)
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            continue
+        rng = np.random.default_rng(seed * 1_000_003 + i)
+        background = BACKGROUND_EMPTY if i % 10 == 9 else BACKGROUND_TWO if i % 10 == 8 else BACKGROUND_ONE
+        img = np.full((height, width, 3), background, dtype=np.uint8)
+        # a disc with a flat edge and a few scratches, roughly where the preset box sits
+        center = (width // 2 + int(rng.integers(-20, 21)), int(height * 0.55) + int(rng.integers(-20, 21)))
+        radius = int(min(width * 0.2, height * 0.33))
+        cv2.circle(img, center, radius, (int(rng.integers(150, 200)),) * 3, -1)
+        cv2.rectangle(img, (center[0] - radius, center[1] + radius - radius // 8),
+                      (center[0] + radius, center[1] + radius), (background,) * 3, -1)
+        for _ in range(5):
+            p1 = tuple(int(v) for v in rng.integers((0, 0), (width, height)))
+            p2 = tuple(int(v) for v in rng.integers((0, 0), (width, height)))
+            cv2.line(img, p1, p2, (int(rng.integers(0, 256)),) * 3, 1)
+        noise = rng.normal(0, 6, (height, width, 1)).astype(np.int16)
+        img = np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        cv2.imwrite(path, img)
+    return names
+
+
+class StubDetector:
+    """Offline stand-in for a YOLO model, called like one and answering with NumpyResult.
+
+    Boxes are derived from the image alone: one centered w x h box
+    (normalized), two for bright backgrounds, none for dark ones.
+    """
+
+    names = dict(enumerate(CLASS_PREFIXES))
+
+    def __init__(self, w=0.40, h=0.65, conf=0.9):
+        self.w = w
+        self.h = h
+        self.conf = conf
+
+    def boxes(self, img):
+        height, width = img.shape[:2]
+        corner = img[:16, :16].mean()
+        if corner < (BACKGROUND_EMPTY + BACKGROUND_ONE) / 2:
+            centers = []
+        elif corner > (BACKGROUND_ONE + BACKGROUND_TWO) / 2:
+            centers = [(0.3, 0.5), (0.7, 0.5)]
+        else:
+            centers = [(0.5, 0.55)]
+        xyxy = np.array([[(x - self.w / 2) * width, (y - self.h / 2) * height,
+                          (x + self.w / 2) * width, (y + self.h / 2) * height] for x, y in centers],
+                        dtype=np.float32).reshape(-1, 4)
+        conf = np.full(len(xyxy), self.conf, dtype=np.float32)
+        return NumpyBoxes(xyxy, conf, np.zeros(len(xyxy), dtype=np.float32))
+
+    def __call__(self, imgs, conf=0.25, imgsz=None, verbose=False, **kwargs):
+        return [NumpyResult(self.boxes(img), self.names) for img in imgs]
+
+
+def current_rss():
+    """Resident set size of this process in bytes, None when it can't be read."""
+    try:
+        # optional, the /proc fallback covers Linux without it
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PeakRss:
+    """Highest RSS seen while the with-block runs, sampled from a background thread."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = None
+        self.start = None
+        self.stop_event = threading.Event()
+
+    def sample(self):
+        while not self.stop_event.wait(self.interval):
+            self.update()
+
+    def update(self):
+        rss = current_rss()
+        if rss is not None:
+            self.peak = rss if self.peak is None else max(self.peak, rss)
+
+    def __enter__(self):
+        self.start = current_rss()
+        self.update()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.update()
+        return False
+
+
+def folder_bytes(folder):
+    total = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            total += os.lstat(os.path.join(root, name)).st_size
+    return total
+
+
+def count_files(*folders):
+    return sum(len(os.listdir(folder)) for folder in folders if os.path.isdir(folder))
+
+
+def count_encodes(result, timer, *overlay_folders):
+    """Add the number of encodes and overlay files of a run, main fails when they differ."""
+    result["encodes"] = len(timer.samples.get("imwrite", ()))
+    result["overlays"] = count_files(*overlay_folders)
+    return result
+
+
+def measure(name, count, output_path, fn):
+    """Run fn once, return images/sec, peak RSS and bytes written below output_path."""
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+    result = {
+        "images": count,
+        "seconds": elapsed,
+        "images_per_sec": count / elapsed if elapsed > 0 else 0.0,
+        "peak_rss": rss.peak,
+        "rss_growth": rss.peak - rss.start if rss.peak is not None and rss.start is not None else None,
+        "bytes_written": folder_bytes(output_path),
+    }
+    print(f"{name} : {count} images in {elapsed:.2f}s ({result['images_per_sec']:.2f} images/sec)")
+    return result
+
+
+def bench_program(input_path, output_path, count, batch_size=1, decode_scale=1, seed=0, overlay="all", every=10):
+    """program.run end to end with the stub detector, fresh output folder."""
+    # previews are sampled at random, a fixed seed keeps bytes written comparable
+    random.seed(seed)
+    auto_label = program()
+    # a box inside the first acceptance range, so images are labeled whatever presets.json says
+    w = sum(auto_label.w_ranges[0]) / 2
+    h = sum(auto_label.h_ranges[0]) / 2
+    auto_label.model = StubDetector(w, h)
+    auto_label.model_path = "stub"
+    auto_label.set_resolution(decode_scale)
+    auto_label.set_class()
+    auto_label.set_input_path(input_path)
+    auto_label.set_output_path(output_path)
+    auto_label.create_output_folder(output_path)
+    auto_label.create_report_folder(output_path)
+    auto_label.set_batch_size(batch_size)
+    auto_label.set_overlay(overlay, every)
+    # stage samples count the encodes, timing costs a few perf_counter calls per stage
+    auto_label.set_timing(True)
+    result = measure("program.run", count, output_path, auto_label.run)
+    return count_encodes(result, auto_label.timer, auto_label.detection_path, os.path.join(output_path, "preview"))
+
+
+def bench_process_images(input_path, output_path, image_files, bbox_size="6 inch"):
+    """AutoLabelingApp.process_images on the calling thread, without a window."""
+    # process_images only needs its folders, the manifest, a timer and a cancel flag
+    labeler = AutoLabelingApp.__new__(AutoLabelingApp)
+    labeler.image_folder = input_path
+    labeler.output_folder = output_path
+    labeler.timer = StageTimer(True)
+    labeler.progress_dialog = SimpleNamespace(is_cancelled=False)
+    os.makedirs(output_path, exist_ok=True)
+    labeler.manifest = Manifest(os.path.join(output_path, "manifest.jsonl"),
+                                {"bbox_size": bbox_size, "overlay": "all", "overlay_every": 1, "format": "same"})
+    channel = ProgressChannel(len(image_files))
+
+    def run():
+        labeler.process_images(image_files, channel, bbox_presets[bbox_size])
+        if channel.error is not None:
+            raise channel.error
+    result = measure("process_images", len(image_files), output_path, run)
+    return count_encodes(result, labeler.timer, os.path.join(output_path, "image_label"))
+
+
+def transfer_mode_switches(scratch):
+    """Transfer into the same dst with every pair of modes, return the pairs that failed.
+
+    A rerun with another --transfer mode has to replace what the last run
+    left (a hardlink, a symlink), never fail on it or write through it into
+    the file it points to.
+    """
+    folder = os.path.join(scratch, "transfer")
+    os.makedirs(folder, exist_ok=True)
+    first_src = os.path.join(folder, "first.bin")
+    second_src = os.path.join(folder, "second.bin")
+    dst = os.path.join(folder, "dst.bin")
+    modes = [mode for mode in TRANSFER_MODES if mode not in ("move", "none")]
+    failed = []
+    for first in modes:
+        for second in modes:
+            for path, data in ((first_src, b"first"), (second_src, b"second")):
+                with open(path, "wb") as f:
+                    f.write(data)
+            try:
+                transfer_file(first_src, dst, first)
+                transfer_file(second_src, dst, second)
+                with open(first_src, "rb") as f, open(dst, "rb") as g:
+                    ok = f.read() == b"first" and g.read() == b"second"
+            except OSError:
+                ok = False
+            if not ok:
+                failed.append(f"{first} -> {second}")
+            remove_existing(dst)
+    return failed
+
+
+def run_suite(count=200, size=(1920, 1080), ext=".jpg", seed=0, images_path=None, batch_size=1, decode_scale=1,
+              overlay="all", every=10):
+    """Generate the images and time both labelers, return {name: result} and the failed transfer mode switches."""
+    scratch = tempfile.mkdtemp(prefix="autolabel_synth_")
+    try:
+        input_path = images_path or os.path.join(scratch, "images")
+        image_files = make_images(input_path, count, size, ext, seed)
+        results = {
+            "program.run": bench_program(input_path, os.path.join(scratch, "program"), count, batch_size, decode_scale,
+                                         seed, overlay, every),
+            "process_images": bench_process_images(input_path, os.path.join(scratch, "labeledit"), image_files),
+        }
+        transfer_failures = transfer_mode_switches(scratch)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results, transfer_failures
+
+
+def megabytes(value):
+    return f"{value / 2 ** 20:.1f}" if value is not None else "n/a"
+
+
+def print_results(results, baseline=None):
+    print("=" * 96)
+    print(f"{'benchmark':<16} {'images/sec':>12} {'vs base':>9} {'peak RSS MB':>12} {'growth MB':>10} {'written MB':>11} "
+          f"{'encodes':>8} {'/image':>7}")
+    for name, result in results.items():
+        change = ""
+        if baseline and name in baseline and baseline[name]["images_per_sec"]:
+            change = f"{(result['images_per_sec'] / baseline[name]['images_per_sec'] - 1) * 100:+.1f}%"
+        print(f"{name:<16} {result['images_per_sec']:>12.2f} {change:>9} {megabytes(result['peak_rss']):>12} "
+              f"{megabytes(result['rss_growth']):>10} {megabytes(result['bytes_written']):>11} "
+              f"{result['encodes']:>8} {result['encodes'] / max(1, result['images']):>7.2f}")
+    print("=" * 96)
+
+
+def regressions(results, baseline, max_drop=0.1):
+    """Benchmarks whose images/sec fell by more than max_drop against the baseline."""
+    return [name for name, result in results.items()
+            if name in baseline and result["images_per_sec"] < baseline[name]["images_per_sec"] * (1 - max_drop)]
+
+
+def encode_mismatches(results):
+    """Benchmarks that did not encode every overlay image exactly once."""
+    return [name for name, result in results.items() if result["encodes"] != result["overlays"]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark on synthetic images with a stub detector")
+    parser.add_argument("--count", type=int, default=200, help="number of synthetic images")
+    parser.add_argument("--size", type=int, nargs=2, default=[1920, 1080], metavar=("W", "H"), help="image size")
+    parser.add_argument("--ext", default=".jpg", choices=[".jpg", ".png", ".bmp"], help="image format")
+    parser.add_argument("--seed", type=int, default=0, help="same seed, same images")
+    parser.add_argument("--images", help="keep the synthetic images in this folder and reuse them next time")
+    parser.add_argument("--batch-size", type=int, default=1, help="images per model call in program.run")
+    parser.add_argument("--decode-scale", type=int, choices=[1, 2, 4, 8], default=1, help="program.run decode scale")
+    parser.add_argument("--overlay", choices=OVERLAY_MODES, default="all", help="program.run overlay mode")
+    parser.add_argument("--overlay-every", type=int, default=10, help="N of --overlay every")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--max-drop", type=float, default=0.1,
+                        help="exit with status 1 when images/sec drops by more than this fraction of the baseline "
+                             "(status 1 also when an overlay is not encoded exactly once or a transfer mode switch fails)")
+    args = parser.parse_args(argv)
+
+    results, transfer_failures = run_suite(args.count, tuple(args.size), args.ext, args.seed, args.images,
+                                           args.batch_size, args.decode_scale, args.overlay, args.overlay_every)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "max_drop")}
+        with open(args.output, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+    failed = encode_mismatches(results)
+    for name in failed:
+        print(f"regression : {name} made {results[name]['encodes']} encodes for {results[name]['overlays']} overlay images")
+    for switch in transfer_failures:
+        print(f"regression : transfer {switch} on the same output did not replace the earlier file")
+    failed += transfer_failures
+    if baseline:
+        slower = regressions(results, baseline, args.max_drop)
+        for name in slower:
+            print(f"regression : {name} is more than {args.max_drop * 100:.0f}% slower than the baseline")
+        failed += slower
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,63 @@
+import os
+import shutil
+
+# none leaves the image where it is, for runs that only produce label files
+TRANSFER_MODES = ("copy", "hardlink", "reflink", "symlink", "move", "none")
+
+# ioctl request number of FICLONE on Linux (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+def reflink(src, dst):
+    """Copy-on-write clone of src, raises OSError where the filesystem can't do it."""
+    import fcntl
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    shutil.copymode(src, dst)
+
+
+def remove_existing(dst):
+    # os.link / os.symlink refuse to replace a file left by a previous run
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+
+def transfer_file(src, dst, mode="copy"):
+    """Put src at dst with one of TRANSFER_MODES.
+
+    hardlink and reflink fall back to a plain copy when the filesystem can't
+    do them, e.g. when src and dst are on different devices.
+    """
+    if mode == "copy":
+        # a link left by a hardlink or symlink run would be written through into src
+        remove_existing(dst)
+        shutil.copy(src, dst)
+    elif mode == "hardlink":
+        remove_existing(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy(src, dst)
+    elif mode == "reflink":
+        remove_existing(dst)
+        try:
+            reflink(src, dst)
+        except (OSError, ImportError):
+            shutil.copy(src, dst)
+    elif mode == "symlink":
+        remove_existing(dst)
+        os.symlink(os.path.abspath(src), dst)
+    elif mode == "move":
+        shutil.move(src, dst)
+    elif mode == "none":
+        return
+    else:
+        raise ValueError(f"unknown transfer mode: {mode}")
+
+
+def transfer_to_all(src, destinations, mode="copy"):
+    """Transfer src to every destination in order, a move only happens for the last one."""
+    for dst in destinations[:-1]:
+        transfer_file(src, dst, "hardlink" if mode == "move" else mode)
+    if destinations:
+        transfer_file(src, destinations[-1], mode)